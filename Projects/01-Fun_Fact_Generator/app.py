@@ -1,18 +1,150 @@
 import streamlit as st
-import google.generativeai as genai
 import os
+import sys
+import json
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load API key from .env file
 load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
-# Function to generate a fun fact
+# Make the shared Projects/llm_gateway package importable. Streamlit reruns
+# this script on every interaction, so the path is only added once.
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECTS_DIR not in sys.path:
+    sys.path.append(PROJECTS_DIR)
+
+import llm_gateway
+
+# Facts generated per API call, and when to fetch the next batch
+FACTS_PER_BATCH = 10
+REFILL_BELOW = 3
+
+# How many topics keep a pool of facts (least recently used topics are dropped)
+MAX_TOPICS = 200
+
+# One model for all sessions, instead of a new one on every click
+@st.cache_resource
+def get_model():
+    return llm_gateway.gemini_model("gemini-1.5-flash")
+
+# Function to generate a single fun fact, when no batch is available
 def generate_fun_fact(topic):
-    model = genai.GenerativeModel("gemini-1.5-flash")
-    response = model.generate_content(f"Tell me a fun fact about {topic}.")
+    response = get_model().generate_content(f"Tell me a fun fact about {topic}.")
     return response.text.strip()
 
+# Function to generate a batch of distinct fun facts in one call
+def generate_fun_facts(topic, count=FACTS_PER_BATCH, avoid=()):
+    prompt = (
+        f"Tell me {count} different fun facts about {topic}. "
+        "Each fact should be one or two sentences and about something different. "
+        "Answer with a JSON array of strings only."
+    )
+    if avoid:
+        prompt += " Don't repeat these facts:\n" + "\n".join(f"- {fact}" for fact in avoid)
+
+    response = get_model().generate_content(
+        prompt,
+        generation_config={"response_mime_type": "application/json"}
+    )
+    try:
+        facts = json.loads(response.text)
+    except ValueError:
+        facts = None
+    # Anything but a JSON array of strings (e.g. an object or a single string)
+    # gives no facts, and the click asks for a single fact instead
+    if not isinstance(facts, list) or not all(isinstance(fact, str) for fact in facts):
+        return []
+    return [fact.strip() for fact in facts if fact.strip()]
+
+class FactPool:
+    """
+    Facts prefetched per topic and shared by all sessions.
+
+    Each click takes a fact from the topic's pool. When the pool runs low, the
+    next batch is generated in the background, so popular topics are answered
+    instantly and one API call serves many clicks.
+    """
+
+    def __init__(self, max_topics=MAX_TOPICS):
+        self.max_topics = max_topics
+        self.pools = OrderedDict()  # topic -> deque of unseen facts, least recently used first
+        self.served = {}  # topic -> recently served facts, so new batches don't repeat them
+        self.refills = {}  # topic -> Future of the batch being generated
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.api_calls = 0
+        self.facts_served = 0
+
+    def _refill(self, topic):
+        with self.lock:
+            avoid = list(self.served.get(topic, ()))
+            self.api_calls += 1
+        try:
+            facts = generate_fun_facts(topic, avoid=avoid)
+        except Exception:
+            with self.lock:
+                self.refills.pop(topic, None)
+            raise
+
+        with self.lock:
+            pool = self.pools.setdefault(topic, deque())
+            known = set(pool) | set(avoid)
+            pool.extend(fact for fact in dict.fromkeys(facts) if fact not in known)
+            # Cleared together with adding the facts, so a click never finds
+            # an empty pool with no refill in flight and starts another one
+            self.refills.pop(topic, None)
+            self.pools.move_to_end(topic)
+            while len(self.pools) > self.max_topics:
+                old_topic, _ = self.pools.popitem(last=False)
+                self.served.pop(old_topic, None)
+
+    def _start_refill(self, topic):
+        # Called with the lock held; at most one refill per topic at a time
+        if topic not in self.refills:
+            self.refills[topic] = self.executor.submit(self._refill, topic)
+        return self.refills[topic]
+
+    def _take_fact(self, topic):
+        # Called with the lock held; None if the topic's pool is empty
+        pool = self.pools.get(topic)
+        if not pool:
+            return None
+        fact = pool.popleft()
+        self.pools.move_to_end(topic)
+        self.served.setdefault(topic, deque(maxlen=2 * FACTS_PER_BATCH)).append(fact)
+        self.facts_served += 1
+        if len(pool) < REFILL_BELOW:
+            self._start_refill(topic)
+        return fact
+
+    def next_fact(self, topic):
+        """Return (fact, from_pool) for the topic."""
+        topic = " ".join(topic.lower().split())
+        with self.lock:
+            fact = self._take_fact(topic)
+            if fact is not None:
+                return fact, True
+            refill = self._start_refill(topic)
+
+        # Nothing prefetched yet, so wait for the batch (raises if it failed)
+        refill.result()
+        with self.lock:
+            fact = self._take_fact(topic)
+            if fact is not None:
+                return fact, False
+            self.api_calls += 1
+            self.facts_served += 1
+
+        # The batch had no usable facts, so ask for a single one
+        return generate_fun_fact(topic), False
+
+@st.cache_resource
+def get_fact_pool():
+    return FactPool()
+
 # Streamlit UI
 st.title("🎉 AI-Powered Fun Facts Generator")
 st.write("Enter a topic, and the AI will generate a fun fact for you!")
@@ -21,7 +153,11 @@ topic = st.text_input("Enter a topic (e.g., Space, Animals, History)")
 
 if st.button("Generate Fun Fact"):
     if topic:
-        fact = generate_fun_fact(topic)
+        pool = get_fact_pool()
+        with st.spinner("Thinking of a fun fact..."):
+            fact, from_pool = pool.next_fact(topic)
         st.success(fact)
+        source = "⚡ Ready in advance" if from_pool else "Freshly generated"
+        st.caption(f"{source} · {pool.facts_served} facts served with {pool.api_calls} API calls")
     else:
-        st.warning("Please enter a topic.")
\ No newline at end of file
+        st.warning("Please enter a topic.")
@@ -1,15 +1,19 @@
+import os
+import sys
+
 import streamlit as st
-import google.generativeai as genai
 from dotenv import load_dotenv
-import os
 
-# Load API Key
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
+# Make the shared Projects/llm_gateway package importable. Streamlit reruns
+# this script on every interaction, so the path is only added once.
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECTS_DIR not in sys.path:
+    sys.path.append(PROJECTS_DIR)
 
-# Initialize Gemini model
-model = genai.GenerativeModel("gemini-1.5-flash")
+import chat_engine
+
+# Load API Key (chat_engine uses it through the shared provider gateway)
+load_dotenv()
 
 # Initialize Session State
 if "chat_history" not in st.session_state:
@@ -26,6 +30,13 @@ st.caption("Your personal AI-powered math & science tutor!")
 subject = st.sidebar.selectbox("Choose a subject 📚", ["General", "Math", "Science"])
 st.session_state.eli5_mode = st.sidebar.checkbox("Explain Like I'm 5 (ELI5) 🧒", st.session_state.eli5_mode)
 
+# The Gemini chat session, which remembers the conversation; subject and ELI5
+# mode are its system instruction, so they aren't repeated in every question
+if "study_chat" not in st.session_state:
+    st.session_state.study_chat = chat_engine.StudyChat(subject, st.session_state.eli5_mode)
+study_chat = st.session_state.study_chat
+study_chat.set_mode(subject, st.session_state.eli5_mode)
+
 # Display Chat History
 for entry in st.session_state.chat_history:
     role, message = entry
@@ -37,24 +48,22 @@ for entry in st.session_state.chat_history:
 # User Input
 user_input = st.chat_input("Ask me a question...")
 
-# Generate AI Response with Context Awareness and ELI5 Mode
+# Generate AI Response in the ongoing conversation
 if user_input:
     st.session_state.chat_history.append(("user", user_input))
     with st.chat_message("user"):
         st.markdown(user_input)
 
     with st.chat_message("assistant"):
-        with st.spinner("Thinking... 🤖"):
-            try:
-                # Building conversation context
-                context = "\n".join([f"{role}: {msg}" for role, msg in st.session_state.chat_history[-5:]])  # Last 5 interactions
-                eli5_prefix = "Explain like I'm 5: " if st.session_state.eli5_mode else ""
-                prompt = f"{context}\n{eli5_prefix}Answer this {subject.lower()} question: {user_input}"
-                response = model.generate_content(prompt)
-                reply = response.text.strip()
-                st.markdown(reply)
-                st.session_state.chat_history.append(("assistant", reply))
-            except Exception as e:
-                error_message = f"Error: {e}"
-                st.error(error_message)
-                st.session_state.chat_history.append(("assistant", error_message))
\ No newline at end of file
+        try:
+            # The chat sends the earlier turns (trimmed to the token budget) with
+            # the new question; the tutor instructions are the system instruction
+            with st.spinner("Thinking... 🤖"):
+                study_chat.send(user_input)
+            # Show the answer word by word while Gemini is still writing it
+            reply = st.write_stream(study_chat.stream_reply()).strip()
+            st.session_state.chat_history.append(("assistant", reply))
+        except Exception as e:
+            error_message = f"Error: {e}"
+            st.error(error_message)
+            st.session_state.chat_history.append(("assistant", error_message))
\ No newline at end of file
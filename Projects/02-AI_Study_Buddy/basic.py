@@ -1,15 +1,25 @@
+import os
+import sys
+
 import streamlit as st
-import google.generativeai as genai
 from dotenv import load_dotenv
-import os
 
-# Load API Key
+# Make the shared Projects/llm_gateway package importable. Streamlit reruns
+# this script on every interaction, so the path is only added once.
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECTS_DIR not in sys.path:
+    sys.path.append(PROJECTS_DIR)
+
+import chat_engine
+import llm_gateway
+
+# Load API Key (chat_engine uses it through the shared provider gateway)
 load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
 
-# Initialize Gemini model
-model = genai.GenerativeModel("gemini-1.5-flash")
+# Answers to repeated questions, stored next to this script
+answer_cache = llm_gateway.open_answer_cache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".answer_cache.sqlite3")
+)
 
 # Initialize Session State
 if "chat_history" not in st.session_state:
@@ -23,6 +33,12 @@ st.caption("Your personal AI-powered math & science tutor!")
 # Sidebar for Subject Selection
 subject = st.sidebar.selectbox("Choose a subject 📚", ["General", "Math", "Science"])
 
+# The Gemini chat session, which remembers the conversation
+if "study_chat" not in st.session_state:
+    st.session_state.study_chat = chat_engine.StudyChat(subject)
+study_chat = st.session_state.study_chat
+study_chat.set_mode(subject)
+
 # Display Chat History
 for entry in st.session_state.chat_history:
     role, message = entry
@@ -41,14 +57,23 @@ if user_input:
         st.markdown(user_input)
 
     with st.chat_message("assistant"):
-        with st.spinner("Thinking... 🤖"):
-            try:
-                prompt = f"Answer this {subject.lower()} question: {user_input}"
-                response = model.generate_content(prompt)
-                reply = response.text.strip()
+        try:
+            # Answers depend on the conversation so far, so they are reused
+            # per subject and conversation (e.g. a first question about a topic)
+            namespace = f"{subject}:{study_chat.context_key()}"
+            reply = answer_cache.get(namespace, user_input)
+            if reply is not None:
                 st.markdown(reply)
-                st.session_state.chat_history.append(("bot", reply))
-            except Exception as e:
-                error_message = f"Error: {e}"
-                st.error(error_message)
-                st.session_state.chat_history.append(("bot", error_message))
\ No newline at end of file
+                st.caption("⚡ Answered from cache")
+                study_chat.add_turn(user_input, reply)
+            else:
+                with st.spinner("Thinking... 🤖"):
+                    study_chat.send(user_input)
+                # Show the answer word by word while Gemini is still writing it
+                reply = st.write_stream(study_chat.stream_reply()).strip()
+                answer_cache.put(namespace, user_input, reply)
+            st.session_state.chat_history.append(("bot", reply))
+        except Exception as e:
+            error_message = f"Error: {e}"
+            st.error(error_message)
+            st.session_state.chat_history.append(("bot", error_message))
\ No newline at end of file
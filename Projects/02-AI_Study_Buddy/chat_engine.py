@@ -0,0 +1,138 @@
+"""
+Multi-turn Gemini chat sessions for the Study Buddy.
+
+Each question used to be a separate generate_content() call with the last
+few messages and the subject/ELI5 instructions pasted into the prompt. Here
+every browser session has a real chat (`start_chat`) whose history Gemini
+sees as earlier turns, and the tutor instructions are the model's system
+instruction instead of being repeated in every message.
+
+The models (one per subject and ELI5 setting) are created once and shared by
+all sessions. A chat still sends its whole history with every question, so
+each session's history is trimmed to a token budget using the token counts
+Gemini reports with every answer.
+"""
+import hashlib
+import os
+
+import streamlit as st
+from google.generativeai.types import BrokenResponseError
+
+import llm_gateway
+
+MODEL_NAME = "gemini-1.5-flash-002"
+
+# Tokens of conversation kept per session; older turns are dropped first
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 8000))
+
+# The most recent turns are always kept, however long they are
+KEEP_RECENT_TURNS = 2
+
+BASE_INSTRUCTION = (
+    "You are a friendly AI study buddy, a patient math and science tutor. "
+    "Answer the student's questions clearly and correctly, build on what was said earlier in the conversation, "
+    "and use examples when they help."
+)
+SUBJECT_INSTRUCTIONS = {
+    "General": "The student can ask about any school subject.",
+    "Math": "The student is asking about math. Show the steps of calculations.",
+    "Science": "The student is asking about science. Explain the ideas behind the facts.",
+}
+ELI5_INSTRUCTION = "Explain like I'm 5: use very simple words, short sentences and everyday comparisons."
+
+
+def system_instruction(subject, eli5=False):
+    parts = [BASE_INSTRUCTION, SUBJECT_INSTRUCTIONS.get(subject, SUBJECT_INSTRUCTIONS["General"])]
+    if eli5:
+        parts.append(ELI5_INSTRUCTION)
+    return " ".join(parts)
+
+
+@st.cache_resource(show_spinner=False)
+def get_model(subject, eli5=False):
+    """The shared model for this subject and ELI5 setting."""
+    return llm_gateway.gemini_model(MODEL_NAME, system_instruction=system_instruction(subject, eli5))
+
+
+class StudyChat:
+    """One session's conversation with Gemini, kept within a token budget."""
+
+    def __init__(self, subject, eli5=False, budget=HISTORY_TOKEN_BUDGET):
+        self.budget = budget
+        self.subject = subject
+        self.eli5 = eli5
+        self.chat = get_model(subject, eli5).start_chat()
+
+        # Tokens each turn (question + answer) added, and the conversation's total
+        self.turn_tokens = []
+        self.total_tokens = 0
+        self.pending = None
+
+    def set_mode(self, subject, eli5=False):
+        """Switch subject or ELI5 mode, keeping the conversation so far."""
+        if (subject, eli5) != (self.subject, self.eli5):
+            self.subject, self.eli5 = subject, eli5
+            self.chat = get_model(subject, eli5).start_chat(history=self.chat.history)
+
+    def context_key(self):
+        """Short hash of the conversation so far, e.g. for caching answers."""
+        earlier = [f"{content.role}: {content.parts[0].text}" for content in self.chat.history if content.parts]
+        return hashlib.sha256("\n".join(earlier).encode("utf-8")).hexdigest()[:16]
+
+    def send(self, question):
+        """Send a question; returns once the first part of the answer has arrived."""
+        history = list(self.chat.history)
+        self.pending = (question, history, self.chat.send_message(question, stream=True))
+
+    def stream_reply(self):
+        """
+        Yield the text of the answer as it streams in. Afterwards, the turn's
+        token usage is recorded and the history is trimmed if needed.
+        """
+        question, history, response = self.pending
+        self.pending = None
+        answer = ""
+        try:
+            for chunk in response:
+                if chunk.parts:
+                    answer += chunk.text
+                    yield chunk.text
+            # Adds the turn to the history, or raises if Gemini blocked the
+            # answer (e.g. finish reason SAFETY)
+            self.chat.history
+        except BrokenResponseError as e:
+            # The chat keeps the unfinished answer, and every later use of its
+            # history would raise, so it goes back to the turns before it
+            self.chat.history = history
+            raise RuntimeError(
+                "Gemini stopped before finishing the answer. Please try again or ask in a different way."
+            ) from e
+        except BaseException:
+            # Failed or abandoned halfway (e.g. the page was closed)
+            self.chat.history = history
+            raise
+
+        # Gemini reports the size of the whole conversation with the last chunk
+        total = response.usage_metadata.total_token_count
+        self._add_turn(total - self.total_tokens if total else (len(question) + len(answer)) // 4)
+
+    def add_turn(self, question, answer):
+        """Add a question answered without the model (e.g. from a cache) to the history."""
+        self.chat.history = self.chat.history + [
+            {"role": "user", "parts": [question]},
+            {"role": "model", "parts": [answer]},
+        ]
+        # Rough estimate, about 4 characters per token
+        self._add_turn((len(question) + len(answer)) // 4)
+
+    def _add_turn(self, tokens):
+        self.turn_tokens.append(tokens)
+        self.total_tokens += tokens
+
+        # Drop the oldest question/answer pairs once over budget
+        history = self.chat.history
+        while self.total_tokens > self.budget and len(self.turn_tokens) > KEEP_RECENT_TURNS:
+            self.total_tokens -= self.turn_tokens.pop(0)
+            history = history[2:]
+        if len(history) != len(self.chat.history):
+            self.chat.history = history
@@ -1,38 +1,30 @@
-import streamlit as st
-import google.generativeai as genai
 import os
-from dotenv import load_dotenv
+import sys
+import time
+
+import streamlit as st
 from PIL import Image
 
-# Load environment variables
-load_dotenv()
+# Make the shared Projects/llm_gateway package importable. Streamlit reruns
+# this script on every interaction, so the path is only added once.
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECTS_DIR not in sys.path:
+    sys.path.append(PROJECTS_DIR)
 
-# Configure Google Gemini API
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-model = genai.GenerativeModel('gemini-1.5-flash')
+from travel_engine import ACTIVITIES, BUDGETS, CLIMATES, DEFAULT_DAYS, MAX_DAYS, MIN_DAYS, recommend
 
-def get_travel_recommendations(climate, activity, budget, duration):
-    # Craft the prompt for the AI
-    prompt = f"""
-    Suggest 3 travel destinations based on these preferences:
-    - Preferred climate: {climate}
-    - Desired activity type: {activity}
-    - Budget level: {budget}
-    - Trip duration: {duration} days
-    
-    For each destination, provide:
-    1. City and Country
-    2. Main attractions
-    3. Estimated daily budget
-    4. Best time to visit
-    5. One unique fact
-    
-    Format each destination separately and clearly.
-    """
-    
-    # Get response from Gemini
-    response = model.generate_content(prompt)
-    return response.text
+def show_destination(destination):
+    """One destination as a card"""
+    with st.container(border=True):
+        st.markdown(f"### 📍 {destination.get('city', '')}, {destination.get('country', '')}")
+        attractions = destination.get("attractions") or []
+        if attractions:
+            st.markdown("**Main attractions**\n" + "\n".join(f"- {a}" for a in attractions))
+        budget_column, time_column = st.columns(2)
+        budget_column.markdown(f"**💰 Daily budget:** {destination.get('daily_budget', '')}")
+        time_column.markdown(f"**📅 Best time to visit:** {destination.get('best_time', '')}")
+        if destination.get("fact"):
+            st.info(f"💡 {destination['fact']}")
 
 def main():
     st.title("🌎 AI Travel Destination Recommender")
@@ -44,42 +36,51 @@ def main():
     # Climate preference
     climate = st.selectbox(
         "What's your preferred climate?",
-        ["Tropical", "Mediterranean", "Cold/Snow", "Desert", "Temperate"]
+        CLIMATES
     )
     
     # Activity preference
     activity = st.selectbox(
         "What type of activities do you enjoy?",
-        ["Beach & Relaxation", "Adventure & Sports", "Cultural & Historical",
-         "Nature & Wildlife", "Food & Shopping"]
+        ACTIVITIES
     )
     
     # Budget level
     budget = st.radio(
         "What's your budget level?",
-        ["Budget/Backpacker", "Mid-range", "Luxury"]
+        BUDGETS
     )
     
     # Trip duration
-    duration = st.slider("How many days do you plan to travel?", 3, 30, 7)
+    duration = st.slider("How many days do you plan to travel?", MIN_DAYS, MAX_DAYS, DEFAULT_DAYS)
     
     # Generate recommendations
     if st.button("Get Recommendations! 🎯"):
-        with st.spinner("AI is finding perfect destinations for you..."):
-            try:
-                recommendations = get_travel_recommendations(
+        try:
+            # Served from the store when prepared in advance, otherwise generated now
+            start = time.perf_counter()
+            with st.spinner("AI is finding perfect destinations for you..."):
+                destinations, from_store = recommend(
                     climate, activity, budget, duration
                 )
-                
-                st.subheader("🌟 Your Personalized Travel Recommendations")
-                st.write(recommendations)
-                
-                # Add a fun element for students
-                st.balloons()
-                
-            except Exception as e:
-                st.error(f"Oops! Something went wrong: {str(e)}")
-                st.write("Please try again!")
+
+            st.subheader("🌟 Your Personalized Travel Recommendations")
+            first = None
+            # Each card is shown as soon as its destination is complete
+            for destination in destinations:
+                first = first or time.perf_counter() - start
+                show_destination(destination)
+            elapsed = time.perf_counter() - start
+
+            source = "⚡ Ready in advance" if from_store else "Freshly generated"
+            st.caption(f"{source}: first destination in {first or elapsed:.2f}s, all in {elapsed:.2f}s")
+
+            # Add a fun element for students
+            st.balloons()
+
+        except Exception as e:
+            st.error(f"Oops! Something went wrong: {str(e)}")
+            st.write("Please try again!")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
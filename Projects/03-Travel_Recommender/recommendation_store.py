@@ -0,0 +1,132 @@
+"""
+On-disk store of generated travel recommendations.
+
+The app only offers a fixed set of choices (5 climates x 5 activities x 3
+budgets x 28 trip lengths), so every possible answer can be generated ahead
+of time by warm_up.py and looked up here in milliseconds.
+
+Each destination is a zlib-compressed JSON record, keyed by a hash of its
+content, and a query (the normalized input key) only stores the IDs of its
+destinations. Attractions, best time and fact are tailored to each query's
+climate, activity and trip length, so records are only shared between
+queries when they are exactly the same.
+Queries older than the TTL count as missing, so they are generated again by
+the app or refreshed by the next warm-up run.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import llm_gateway
+
+STORE_PATH = os.getenv(
+    "TRAVEL_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".recommendations.sqlite3")
+)
+TTL_SECONDS = int(os.getenv("TRAVEL_STORE_TTL_SECONDS", 30 * 24 * 3600))
+
+_lock = threading.Lock()
+_connection = None
+
+
+def _db():
+    # One connection shared by all sessions and warm-up tasks of this process
+    global _connection
+    if _connection is None:
+        # The stub backend gets its own file, so placeholder trips are never served for real
+        _connection = sqlite3.connect(llm_gateway.cache_path(STORE_PATH), check_same_thread=False)
+        _connection.execute("CREATE TABLE IF NOT EXISTS destinations (id TEXT PRIMARY KEY, body BLOB)")
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS queries (key TEXT PRIMARY KEY, destination_ids TEXT, created REAL)"
+        )
+    return _connection
+
+
+def _normalize(parts):
+    return "|".join(" ".join(str(part).lower().split()) for part in parts)
+
+
+def make_key(climate, activity, budget, duration):
+    """Normalized key for one combination of inputs; `duration` is days or a bucket label."""
+    return _normalize((climate, activity, budget, duration))
+
+
+def _canonical(destination):
+    return json.dumps(destination, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def destination_id(destination):
+    """Content hash of a destination record: equal only for identical records."""
+    return hashlib.sha256(_canonical(destination)).hexdigest()[:32]
+
+
+def _encode(destination):
+    return zlib.compress(_canonical(destination), 9)
+
+
+def get(key, ttl=TTL_SECONDS):
+    """The stored destinations for the key, or None if missing or expired."""
+    with _lock:
+        row = _db().execute("SELECT destination_ids, created FROM queries WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > ttl:
+            return None
+        ids = json.loads(row[0])
+        bodies = dict(_db().execute(
+            f"SELECT id, body FROM destinations WHERE id IN ({','.join('?' * len(ids))})", ids
+        ).fetchall())
+    if len(bodies) < len(set(ids)):
+        return None
+    return [json.loads(zlib.decompress(bodies[i])) for i in ids]
+
+
+def put(key, destinations):
+    """Store the destinations recommended for the key, replacing any older answer."""
+    ids = [destination_id(destination) for destination in destinations]
+    with _lock:
+        # Records are keyed by content, so an existing one is already the same
+        _db().executemany(
+            "INSERT OR IGNORE INTO destinations (id, body) VALUES (?, ?)",
+            [(i, _encode(destination)) for i, destination in zip(ids, destinations)]
+        )
+        _db().execute(
+            "INSERT OR REPLACE INTO queries (key, destination_ids, created) VALUES (?, ?, ?)",
+            (key, json.dumps(ids, separators=(",", ":")), time.time())
+        )
+        _db().commit()
+
+
+def fresh_keys(ttl=TTL_SECONDS):
+    """Keys of all queries that haven't expired yet."""
+    with _lock:
+        rows = _db().execute("SELECT key FROM queries WHERE created >= ?", (time.time() - ttl,)).fetchall()
+    return {row[0] for row in rows}
+
+
+def prune():
+    """Delete destination records that no query uses any more. Returns how many."""
+    with _lock:
+        used = set()
+        for (ids,) in _db().execute("SELECT destination_ids FROM queries"):
+            used.update(json.loads(ids))
+        unused = [
+            (row[0],) for row in _db().execute("SELECT id FROM destinations")
+            if row[0] not in used
+        ]
+        _db().executemany("DELETE FROM destinations WHERE id = ?", unused)
+        _db().commit()
+    return len(unused)
+
+
+def stats():
+    with _lock:
+        queries, id_bytes = _db().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(destination_ids)), 0) FROM queries"
+        ).fetchone()
+        destinations, body_bytes = _db().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM destinations"
+        ).fetchone()
+    return {"queries": queries, "destinations": destinations, "bytes": id_bytes + body_bytes}
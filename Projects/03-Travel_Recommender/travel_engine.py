@@ -0,0 +1,177 @@
+"""
+Travel recommendations for the app (app.py) and the warm-up job (warm_up.py).
+
+recommend() answers from the recommendation store when it can and only asks
+Gemini on a miss. The choices offered by the app are defined here, so the
+warm-up job can generate every combination ahead of time.
+
+Gemini answers with a JSON array of destinations matching DESTINATION_SCHEMA.
+The array is parsed while it streams in, so each destination can be shown as
+soon as it is complete, and stored as its own record.
+"""
+import json
+import os
+
+from dotenv import load_dotenv
+
+import llm_gateway
+import recommendation_store
+
+# Load environment variables
+load_dotenv()
+
+# Gemini model, rate limited and retried by the gateway
+model = llm_gateway.gemini_model('gemini-1.5-flash')
+
+CLIMATES = ["Tropical", "Mediterranean", "Cold/Snow", "Desert", "Temperate"]
+ACTIVITIES = ["Beach & Relaxation", "Adventure & Sports", "Cultural & Historical",
+              "Nature & Wildlife", "Food & Shopping"]
+BUDGETS = ["Budget/Backpacker", "Mid-range", "Luxury"]
+MIN_DAYS, MAX_DAYS, DEFAULT_DAYS = 3, 30, 7
+
+# With TRAVEL_DURATION_BUCKETS=1, trips of similar length share one set of
+# recommendations (375 combinations to generate instead of 2,100)
+USE_DURATION_BUCKETS = os.getenv("TRAVEL_DURATION_BUCKETS", "0") == "1"
+DURATION_BUCKETS = [(3, 4), (5, 7), (8, 14), (15, 21), (22, 30)]
+
+
+def duration_label(duration, use_buckets=USE_DURATION_BUCKETS):
+    """The trip length as asked for: "7", or the bucket it falls in, e.g. "5-7"."""
+    if use_buckets:
+        for low, high in DURATION_BUCKETS:
+            if low <= duration <= high:
+                return f"{low}-{high}"
+    return str(duration)
+
+
+def all_inputs(use_buckets=USE_DURATION_BUCKETS):
+    """Every (climate, activity, budget, duration label) the app can ask for."""
+    durations = dict.fromkeys(duration_label(days, use_buckets) for days in range(MIN_DAYS, MAX_DAYS + 1))
+    return [
+        (climate, activity, budget, duration)
+        for climate in CLIMATES
+        for activity in ACTIVITIES
+        for budget in BUDGETS
+        for duration in durations
+    ]
+
+
+NUM_DESTINATIONS = 3
+
+# One destination in Gemini's JSON answer
+DESTINATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "city": {"type": "string"},
+        "country": {"type": "string"},
+        "attractions": {"type": "array", "items": {"type": "string"}},
+        "daily_budget": {"type": "string", "description": "estimated cost per day, e.g. \"$60-80 USD\""},
+        "best_time": {"type": "string", "description": "best months or season to visit"},
+        "fact": {"type": "string", "description": "one unique fact about the destination"},
+    },
+    "required": ["city", "country", "attractions", "daily_budget", "best_time", "fact"],
+}
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {"type": "array", "items": DESTINATION_SCHEMA},
+}
+
+
+def build_prompt(climate, activity, budget, duration):
+    # Craft the prompt for the AI
+    return f"""
+    Suggest {NUM_DESTINATIONS} travel destinations based on these preferences:
+    - Preferred climate: {climate}
+    - Desired activity type: {activity}
+    - Budget level: {budget}
+    - Trip duration: {duration} days
+
+    For each destination, provide the city and country, its main attractions,
+    the estimated daily budget, the best time to visit and one unique fact.
+    """
+
+
+def parse_destinations(chunks):
+    """
+    Yield each destination of a streamed JSON array as soon as its object is
+    complete. `chunks` are the pieces of the JSON text as they arrive.
+    """
+    decoder = json.JSONDecoder()
+    text = ""
+    position = None  # where the next destination starts, once "[" has been seen
+    finished = False
+    for chunk in chunks:
+        text += chunk
+        if position is None:
+            start = text.find("[")
+            if start < 0:
+                continue
+            position = start + 1
+
+        while True:
+            # Skip the separator before the next object, then try to read it;
+            # an object that is still incomplete fails and is retried with more text
+            while position < len(text) and text[position] in " \t\r\n,":
+                position += 1
+            if position >= len(text):
+                break
+            if text[position] == "]":
+                finished = True
+                break
+            try:
+                destination, position = decoder.raw_decode(text, position)
+            except json.JSONDecodeError:
+                break
+            yield destination
+
+    if not finished:
+        raise ValueError("The recommendations stopped before the end, please try again.")
+
+
+def stream_text(response):
+    for chunk in response:
+        if chunk.parts:
+            yield chunk.text
+
+
+def get_travel_recommendations(climate, activity, budget, duration):
+    """Start generating; returns an iterator of destinations as they stream in."""
+    # Get response from Gemini
+    response = model.generate_content(
+        build_prompt(climate, activity, budget, duration),
+        generation_config=GENERATION_CONFIG,
+        stream=True
+    )
+    return parse_destinations(stream_text(response))
+
+
+async def get_travel_recommendations_async(climate, activity, budget, duration):
+    """All destinations at once, for the warm-up job."""
+    response = await model.generate_content_async(
+        build_prompt(climate, activity, budget, duration),
+        generation_config=GENERATION_CONFIG
+    )
+    return json.loads(response.text)
+
+
+def recommend(climate, activity, budget, duration):
+    """
+    Return (destinations, from_store) for the chosen preferences. On a miss,
+    `destinations` is an iterator that yields each destination as Gemini
+    finishes it and stores them all at the end.
+    """
+    label = duration_label(duration)
+    key = recommendation_store.make_key(climate, activity, budget, label)
+    destinations = recommendation_store.get(key)
+    if destinations is not None:
+        return destinations, True
+    return _generate_and_store(key, get_travel_recommendations(climate, activity, budget, label)), False
+
+
+def _generate_and_store(key, destinations):
+    finished = []
+    for destination in destinations:
+        finished.append(destination)
+        yield destination
+    if finished:
+        recommendation_store.put(key, finished)
@@ -0,0 +1,85 @@
+"""
+Fill the recommendation store ahead of time, so the app never waits for Gemini.
+
+Generates recommendations for every combination of choices the app offers
+that is missing from the store or has expired. A few requests run at the
+same time, and the shared provider gateway spaces them out to stay within your requests per
+minute quota. Run it again at any time: finished entries are skipped, so an
+interrupted run just carries on, and a run after the TTL refreshes old ones.
+
+Usage:
+    python warm_up.py                      # everything missing or expired
+    python warm_up.py --concurrency 16 --rpm 600
+    TRAVEL_DURATION_BUCKETS=1 python warm_up.py  # same setting as the app!
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Make the shared Projects/llm_gateway package importable
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECTS_DIR not in sys.path:
+    sys.path.append(PROJECTS_DIR)
+
+import llm_gateway
+import recommendation_store
+import travel_engine
+
+
+async def warm_up(todo, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    done = failed = 0
+
+    async def one(inputs):
+        nonlocal done, failed
+        async with limit:
+            try:
+                recommendations = await travel_engine.get_travel_recommendations_async(*inputs)
+            except Exception as e:
+                failed += 1
+                print(f"failed {' / '.join(inputs)}: {e}")
+                return
+            recommendation_store.put(recommendation_store.make_key(*inputs), recommendations)
+            done += 1
+            if done % 25 == 0 or done + failed == len(todo):
+                print(f"[{done + failed}/{len(todo)}] stored")
+
+    await asyncio.gather(*(one(inputs) for inputs in todo))
+    return done, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate recommendations for every choice the app offers.")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests running at the same time")
+    parser.add_argument("--rpm", type=float, default=60, help="Gemini requests per minute")
+    parser.add_argument("--force", action="store_true", help="regenerate entries that haven't expired too")
+    parser.add_argument("--limit", type=int, help="only generate this many (e.g. to try it out)")
+    args = parser.parse_args()
+
+    inputs = travel_engine.all_inputs()
+    fresh = set() if args.force else recommendation_store.fresh_keys()
+    missing = [i for i in inputs if recommendation_store.make_key(*i) not in fresh]
+    todo = missing[:args.limit]
+    buckets = "on" if travel_engine.USE_DURATION_BUCKETS else "off"
+    print(f"{len(inputs)} combinations (duration buckets {buckets}), "
+          f"{len(inputs) - len(missing)} stored, {len(todo)} to generate")
+
+    # The gateway spaces out the Gemini requests (and retries the ones that fail)
+    llm_gateway.set_rate_limit("gemini", args.rpm, burst=args.concurrency)
+
+    start = time.perf_counter()
+    done, failed = asyncio.run(warm_up(todo, args.concurrency))
+    # Refreshed queries leave their old destination records behind
+    recommendation_store.prune()
+    stats = recommendation_store.stats()
+    print(f"Generated {done} in {time.perf_counter() - start:.1f}s, {failed} failed. "
+          f"Store: {stats['queries']} queries, {stats['destinations']} destinations, {stats['bytes'] / 1024:.0f} KB")
+    if failed:
+        print("Run the same command again to retry the failed ones.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,21 @@
 import streamlit as st
-import openai
 import os
 from dotenv import load_dotenv
-from PIL import Image
-import base64
-from io import BytesIO
-import requests
-from huggingface_hub import InferenceClient
-import time
-import httpx
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+# Make the shared Projects/llm_gateway package importable. Streamlit reruns
+# this script on every interaction, so the path is only added once.
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECTS_DIR not in sys.path:
+    sys.path.append(PROJECTS_DIR)
 
-# Load environment variables
-load_dotenv()
+import storybook
+from story_engine import generate_story, illustrate, illustration_prompts, split_paragraphs
 
-# Configure OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
-# Configure Hugging Face
-HF_TOKEN = os.getenv("HUGGINGFACE_TOKEN")
-client = InferenceClient(token=HF_TOKEN)
+# Load environment variables
+load_dotenv()
 
 # Set page config
 st.set_page_config(
@@ -46,68 +41,7 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def generate_story(prompt, age_group):
-    """Generate a story using OpenAI"""
-    system_prompt = f"""Create a short, engaging story suitable for {age_group} students. 
-    The story should be educational, fun, and include a moral lesson. 
-    Make it approximately 300 words long."""
-    
-    response = openai.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.7,
-        max_tokens=500
-    )
-    
-    return response.choices[0].message.content
-
-def generate_image(prompt):
-    """Generate an image using Hugging Face's Stable Diffusion"""
-    try:
-        # Using Stable Diffusion XL model
-        API_URL = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-xl-base-1.0"
-        headers = {"Authorization": f"Bearer {HF_TOKEN}"}
-        
-        # Prepare the prompt for child-friendly illustration
-        enhanced_prompt = f"children's book illustration style, {prompt}, colorful, friendly, safe for children, high quality, detailed, digital art, cute, whimsical, masterpiece, best quality"
-        
-        # Add retry mechanism
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # Make the API request
-                response = requests.post(API_URL, headers=headers, json={"inputs": enhanced_prompt})
-                
-                if response.status_code == 200:
-                    # Convert the image bytes to base64
-                    image_bytes = response.content
-                    img_str = base64.b64encode(image_bytes).decode()
-                    return f"data:image/jpeg;base64,{img_str}"
-                elif response.status_code == 503:
-                    # Model is loading, wait and retry
-                    if attempt < max_retries - 1:
-                        st.info("Model is loading, please wait...")
-                        time.sleep(5)  # Wait 5 seconds before retrying
-                        continue
-                else:
-                    st.error(f"Error from Hugging Face API: {response.status_code}")
-                    st.error(f"Response content: {response.text}")
-                    return "https://via.placeholder.com/400x300?text=Image+Generation+Failed"
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    st.warning(f"Attempt {attempt + 1} failed, retrying...")
-                    time.sleep(2)
-                    continue
-                else:
-                    st.error(f"Error generating image: {str(e)}")
-                    return "https://via.placeholder.com/400x300?text=Image+Generation+Failed"
-            
-    except Exception as e:
-        st.error(f"Error generating image: {str(e)}")
-        return "https://via.placeholder.com/400x300?text=Image+Generation+Failed"
+PLACEHOLDER_IMAGE = "https://via.placeholder.com/400x300?text=Image+Generation+Failed"
 
 def main():
     st.title("📚 AI Storybook Creator")
@@ -129,48 +63,69 @@ def main():
             ["Elementary (6-10)", "Middle School (11-13)", "High School (14-18)"]
         )
     
+    # Illustrated book mode draws a picture for every group of paragraphs
+    illustrated_book = st.checkbox("Illustrated book (a picture for every part of the story)")
+    col3, col4 = st.columns(2)
+    with col3:
+        paragraphs_per_image = st.slider("Paragraphs per picture", 1, 5, 1, disabled=not illustrated_book)
+    with col4:
+        # The pictures are requested at the same time, so the book takes about as long as one picture
+        max_parallel_images = st.slider("Pictures generated at once", 1, 8, 4, disabled=not illustrated_book)
+    
+    # Pictures are resized to the page width and saved in a compact format
+    with st.expander("Picture quality"):
+        image_format = st.radio("Format", list(storybook.FILE_EXTENSIONS), horizontal=True)
+        image_quality = st.slider("Quality", 40, 95, storybook.IMAGE_QUALITY)
+    
     if st.button("Generate Story"):
         if story_prompt:
             with st.spinner("Creating your story..."):
                 # Generate story
                 story = generate_story(story_prompt, age_group)
-                
-                # Split story into paragraphs
-                paragraphs = story.split('\n\n')
-                
-                # Generate image for the first paragraph
-                image_prompt = f"children's book illustration for: {paragraphs[0][:100]}"
-                image_data = generate_image(image_prompt)
-                
-                # Display story with image
-                st.markdown("### Your Story")
-                st.markdown(f'<img src="{image_data}" class="story-image">', unsafe_allow_html=True)
-                
-                for paragraph in paragraphs:
-                    st.markdown(f'<p class="story-text">{paragraph}</p>', unsafe_allow_html=True)
-                
-                # Add download button
-                st.markdown("### Download Your Story")
-                html_content = f"""
-                <html>
-                <head>
-                    <style>
-                        body {{ font-family: Arial, sans-serif; margin: 40px; }}
-                        .story-text {{ font-size: 18px; line-height: 1.6; margin-bottom: 20px; }}
-                        .story-image {{ max-width: 100%; height: auto; border-radius: 10px; margin: 20px 0; }}
-                    </style>
-                </head>
-                <body>
-                    <h1>My AI Story</h1>
-                    <img src="{image_data}" class="story-image">
-                    {''.join(f'<p class="story-text">{p}</p>' for p in paragraphs)}
-                </body>
-                </html>
-                """
-                
-                b64 = base64.b64encode(html_content.encode()).decode()
-                href = f'<a href="data:text/html;base64,{b64}" download="my_story.html">Download Story as HTML</a>'
-                st.markdown(href, unsafe_allow_html=True)
+            
+            # Split story into paragraphs
+            paragraphs = split_paragraphs(story)
+            
+            if illustrated_book:
+                image_prompts = illustration_prompts(paragraphs, paragraphs_per_image)
+            else:
+                # Generate image for the first paragraph only
+                image_prompts = illustration_prompts(paragraphs[:1], 1)
+            
+            # Display the story right away, with a placeholder where each image will go
+            st.markdown("### Your Story")
+            placeholders = {}
+            for i, paragraph in enumerate(paragraphs):
+                if i in image_prompts:
+                    placeholders[i] = st.empty()
+                    placeholders[i].info("🎨 Drawing a picture...")
+                st.markdown(f'<p class="story-text">{paragraph}</p>', unsafe_allow_html=True)
+            
+            # Generate the images in parallel and show each one as soon as it is ready
+            images = {}
+            with ThreadPoolExecutor(max_workers=max_parallel_images) as executor:
+                futures = {
+                    executor.submit(illustrate, prompt, image_format, image_quality): i
+                    for i, prompt in image_prompts.items()
+                }
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        images[i] = future.result()
+                        placeholders[i].image(images[i])
+                    except Exception as e:
+                        st.error(str(e))
+                        placeholders[i].image(PLACEHOLDER_IMAGE)
+            
+            # Add download button
+            st.markdown("### Download Your Story")
+            st.download_button(
+                "Download Story (HTML page with pictures, zipped)",
+                data=storybook.build_book_zip(paragraphs, images, image_format),
+                file_name="my_story.zip",
+                mime="application/zip",
+                on_click="ignore"  # keep the story on the page after downloading
+            )
         else:
             st.warning("Please enter a story prompt!")
 
@@ -0,0 +1,136 @@
+"""
+Headless batch mode: generate a whole class's story books in one run.
+
+Reads prompts from a CSV or JSONL file with a `prompt` column and optional
+`id`, `age_group` and `title` columns, and writes one zipped HTML book per row
+to the output folder. Several books are made at once, and the OpenAI and
+Hugging Face calls are paced by the shared provider gateway's token bucket
+per provider, so the run goes as fast as your API quotas allow. Books that already exist in the output
+folder are skipped, so an interrupted run can simply be started again.
+
+Usage:
+    python batch.py class_prompts.csv --out books
+    python batch.py prompts.jsonl --openai-rpm 60 --hf-rpm 20 --workers 8 --illustrated
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Make the shared Projects/llm_gateway package importable
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECTS_DIR not in sys.path:
+    sys.path.append(PROJECTS_DIR)
+
+import llm_gateway
+import storybook
+from story_engine import generate_story, illustrate, illustration_prompts, split_paragraphs
+
+DEFAULT_AGE_GROUP = "Elementary (6-10)"
+
+
+def read_rows(path):
+    """Rows of the input file as dicts, from CSV or JSONL"""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    for number, row in enumerate(rows, start=1):
+        if not row.get("prompt", "").strip():
+            raise ValueError(f"Row {number} has no prompt")
+        # Row IDs name the output files, so keep them file-system safe
+        row_id = str(row.get("id") or f"story_{number:03d}")
+        row["id"] = re.sub(r"[^\w\-]+", "_", row_id)
+        row["age_group"] = row.get("age_group") or DEFAULT_AGE_GROUP
+    return rows
+
+
+def book_path(out_dir, row):
+    return os.path.join(out_dir, f"{row['id']}.zip")
+
+
+def make_book(row, args, image_pool):
+    """Generate one row's story and pictures and save its book. Returns the book's path."""
+    paragraphs = split_paragraphs(generate_story(row["prompt"], row["age_group"]))
+
+    if args.illustrated:
+        image_prompts = illustration_prompts(paragraphs, args.paragraphs_per_image)
+    else:
+        image_prompts = illustration_prompts(paragraphs[:1], 1)
+
+    futures = {
+        i: image_pool.submit(illustrate, prompt, args.image_format, args.quality)
+        for i, prompt in image_prompts.items()
+    }
+    images = {}
+    for i, future in futures.items():
+        try:
+            images[i] = future.result()
+        except Exception as e:
+            # A book with a missing picture is better than no book
+            print(f"[{row['id']}] picture {i + 1} failed: {e}")
+
+    title = row.get("title") or "My AI Story"
+    book = storybook.build_book_zip(paragraphs, images, args.image_format, title)
+
+    # Write to a temporary file first, so a half-written book is never mistaken for a finished one
+    path = book_path(args.out, row)
+    with open(path + ".tmp", "wb") as f:
+        f.write(book)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a story book for every row of a CSV/JSONL file.")
+    parser.add_argument("input", help="CSV or JSONL file with prompt (and optional id, age_group, title) columns")
+    parser.add_argument("--out", default="books", help="folder for the finished books")
+    parser.add_argument("--workers", type=int, default=4, help="books generated at the same time")
+    parser.add_argument("--image-workers", type=int, default=8, help="pictures generated at the same time")
+    parser.add_argument("--openai-rpm", type=float, default=60, help="OpenAI requests per minute")
+    parser.add_argument("--hf-rpm", type=float, default=30, help="Hugging Face requests per minute")
+    parser.add_argument("--illustrated", action="store_true", help="a picture for every part of the story")
+    parser.add_argument("--paragraphs-per-image", type=int, default=1)
+    parser.add_argument("--image-format", choices=list(storybook.FILE_EXTENSIONS), default=storybook.IMAGE_FORMAT)
+    parser.add_argument("--quality", type=int, default=storybook.IMAGE_QUALITY)
+    args = parser.parse_args()
+
+    rows = read_rows(args.input)
+    os.makedirs(args.out, exist_ok=True)
+
+    # Resume: skip books finished by an earlier run
+    todo = [row for row in rows if not os.path.exists(book_path(args.out, row))]
+    print(f"{len(rows)} stories, {len(rows) - len(todo)} already done, {len(todo)} to make")
+
+    # Short bursts are fine, but the average stays within each provider's quota
+    llm_gateway.set_rate_limit("openai", args.openai_rpm, burst=args.workers)
+    llm_gateway.set_rate_limit("huggingface", args.hf_rpm, burst=args.image_workers)
+
+    start = time.perf_counter()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.image_workers) as image_pool, \
+            ThreadPoolExecutor(max_workers=args.workers) as book_pool:
+        futures = {book_pool.submit(make_book, row, args, image_pool): row for row in todo}
+        for done, (future, row) in enumerate(futures.items(), start=1):
+            try:
+                path = future.result()
+                print(f"[{done}/{len(todo)}] {row['id']}: saved {path}")
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(todo)}] {row['id']}: failed: {e}")
+
+    elapsed = time.perf_counter() - start
+    print(f"Finished {len(todo) - failed} books in {elapsed:.1f}s, {failed} failed")
+    if failed:
+        print("Run the same command again to retry the failed books.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
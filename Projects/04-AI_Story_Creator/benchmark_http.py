@@ -0,0 +1,147 @@
+"""
+Benchmark of connection reuse for image requests, against a local stub server.
+
+The stub server answers every POST with a small fake image after a short
+"generation" delay. To model a real HTTPS connection to Hugging Face, it also
+waits HANDSHAKE_SECONDS whenever a client opens a new connection (the TCP and
+TLS round-trips). Compared:
+
+    fresh   - a new connection per image, like the old requests.post() code
+    pooled  - image_client through the provider gateway's pooled httpx client
+    async   - the same with the gateway's async client
+
+It also checks that a 503 with Retry-After is retried after the requested delay.
+
+Usage:
+    python benchmark_http.py [images] [parallel]
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Make the shared Projects/llm_gateway package importable
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECTS_DIR not in sys.path:
+    sys.path.append(PROJECTS_DIR)
+
+HANDSHAKE_SECONDS = 0.05
+GENERATION_SECONDS = 0.02
+FAKE_IMAGE = b"\x89PNG fake image bytes" * 100
+
+connections_opened = 0
+busy_requests_left = 0
+counter_lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body are sent separately
+
+    def setup(self):
+        global connections_opened
+        super().setup()
+        with counter_lock:
+            connections_opened += 1
+        time.sleep(HANDSHAKE_SECONDS)
+
+    def do_POST(self):
+        global busy_requests_left
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        with counter_lock:
+            busy = busy_requests_left > 0
+            busy_requests_left -= busy
+        if busy:
+            body = b'{"error": "Model is currently loading"}'
+            self.send_response(503)
+            self.send_header("Retry-After", "1")
+        else:
+            time.sleep(GENERATION_SECONDS)
+            body = FAKE_IMAGE
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fresh_request(url):
+    # The old code: module-level requests.post opens a new connection every time
+    response = requests.post(url, json={"inputs": "a cat"})
+    response.raise_for_status()
+    return response.content
+
+
+def run_threads(function, images, parallel):
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        results = list(executor.map(lambda _: function("a cat"), range(images)))
+    assert all(result == FAKE_IMAGE for result in results)
+
+
+async def run_async(image_client, images, parallel):
+    limit = asyncio.Semaphore(parallel)
+
+    async def one():
+        async with limit:
+            return await image_client.generate_image_bytes_async("a cat")
+    results = await asyncio.gather(*(one() for _ in range(images)))
+    assert all(result == FAKE_IMAGE for result in results)
+
+
+def measure(name, run):
+    global connections_opened
+    connections_opened = 0
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<8} {elapsed:>8.2f} {connections_opened:>12}")
+    return elapsed
+
+
+def main():
+    global busy_requests_left
+    images = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    parallel = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    server = start_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}/models/stub"
+
+    # image_client reads the endpoint when it is imported
+    os.environ["HF_IMAGE_API_URL"] = url
+    import image_client
+    # Measure connections, not the gateway's Hugging Face rate limit
+    image_client.llm_gateway.set_rate_limit("huggingface", None)
+
+    print(f"{images} images, {parallel} at a time, {HANDSHAKE_SECONDS * 1000:.0f} ms per new connection")
+    print(f"{'client':<8} {'seconds':>8} {'connections':>12}")
+    fresh = measure("fresh", lambda: run_threads(lambda prompt: fresh_request(url), images, parallel))
+    pooled = measure("pooled", lambda: run_threads(image_client.generate_image_bytes, images, parallel))
+    measure("async", lambda: asyncio.run(run_async(image_client, images, parallel)))
+    print(f"\nConnection reuse: {fresh / pooled:.1f}x faster than a new connection per image")
+
+    # The server asks for a 1 second pause; the client should wait that long, then succeed
+    busy_requests_left = 1
+    start = time.perf_counter()
+    assert image_client.generate_image_bytes("a cat") == FAKE_IMAGE
+    print(f"Retry-After: succeeded after {time.perf_counter() - start:.2f}s (server asked for 1s)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
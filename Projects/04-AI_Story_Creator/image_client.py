@@ -0,0 +1,57 @@
+"""
+Hugging Face image generation through the shared provider gateway.
+
+Every image used to be a fresh `requests.post`, so each one paid for a new
+TCP/TLS connection, and retries waited a fixed 2-5 seconds. Requests now go
+through the gateway's pooled httpx clients (Projects/llm_gateway), which keep
+connections open and reuse them, stay within the Hugging Face requests per
+minute, and retry failed requests with exponential backoff and jitter, or
+after the delay the server asks for in `Retry-After` (or the model's
+estimated loading time).
+
+Set HF_IMAGE_API_URL to call another endpoint instead (for example a
+dedicated Inference Endpoint or a local test server).
+`generate_image_bytes_async()` does the same without blocking the event loop.
+"""
+import os
+
+from dotenv import load_dotenv
+
+import llm_gateway
+
+load_dotenv()
+
+HF_TOKEN = os.getenv("HUGGINGFACE_TOKEN")
+MODEL_ID = "stabilityai/stable-diffusion-xl-base-1.0"
+API_URL = os.getenv("HF_IMAGE_API_URL", f"https://api-inference.huggingface.co/models/{MODEL_ID}")
+
+
+def _headers():
+    return {"Authorization": f"Bearer {HF_TOKEN}"}
+
+
+def _image_bytes(response):
+    # The gateway has already retried rate limits and server errors
+    if response.is_error:
+        raise RuntimeError(f"Error from Hugging Face API: {response.status_code} {response.text[:200]}")
+    return response.content
+
+
+def generate_image_bytes(prompt):
+    """Generate an image and return its encoded bytes. Raises RuntimeError if all attempts fail."""
+    try:
+        response = llm_gateway.http_client("huggingface").post(API_URL, json={"inputs": prompt}, headers=_headers())
+    except Exception as e:
+        raise RuntimeError(f"Error from Hugging Face API: {e}") from e
+    return _image_bytes(response)
+
+
+async def generate_image_bytes_async(prompt):
+    """Async version of generate_image_bytes(); other requests keep running while it waits."""
+    try:
+        response = await llm_gateway.async_http_client("huggingface").post(
+            API_URL, json={"inputs": prompt}, headers=_headers()
+        )
+    except Exception as e:
+        raise RuntimeError(f"Error from Hugging Face API: {e}") from e
+    return _image_bytes(response)
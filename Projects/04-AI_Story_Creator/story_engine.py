@@ -0,0 +1,73 @@
+"""
+Story and picture generation for the Story Creator.
+
+These functions don't use Streamlit, so they are shared by the app (app.py)
+and the headless batch mode (batch.py), and are safe to call from worker
+threads.
+"""
+
+from dotenv import load_dotenv
+
+import image_client
+import llm_gateway
+import storybook
+
+# Load environment variables
+load_dotenv()
+
+
+def generate_story(prompt, age_group):
+    """Generate a story using OpenAI"""
+    system_prompt = f"""Create a short, engaging story suitable for {age_group} students. 
+    The story should be educational, fun, and include a moral lesson. 
+    Make it approximately 300 words long."""
+    
+    response = llm_gateway.openai_client().chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.7,
+        max_tokens=500
+    )
+    
+    return response.choices[0].message.content
+
+
+def generate_image(prompt):
+    """
+    Generate an image using Hugging Face's Stable Diffusion.
+    Returns the image bytes, or raises RuntimeError if it failed.
+    This runs in worker threads, so it must not call st.* functions.
+    """
+    # Prepare the prompt for child-friendly illustration
+    enhanced_prompt = f"children's book illustration style, {prompt}, colorful, friendly, safe for children, high quality, detailed, digital art, cute, whimsical, masterpiece, best quality"
+    
+    # Shared keep-alive connections, rate limiting and retries from the gateway
+    return image_client.generate_image_bytes(enhanced_prompt)
+
+
+def illustrate(prompt, image_format, quality):
+    """
+    Generate a picture and shrink it to the display size straight away, so
+    only the compact version is kept in memory
+    """
+    return storybook.compress_image(generate_image(prompt), image_format, quality)
+
+
+def illustration_prompts(paragraphs, paragraphs_per_image):
+    """
+    One image prompt per group of `paragraphs_per_image` paragraphs.
+    Returns {index of the group's first paragraph: prompt}.
+    """
+    prompts = {}
+    for start in range(0, len(paragraphs), paragraphs_per_image):
+        group = " ".join(paragraphs[start:start + paragraphs_per_image])
+        prompts[start] = f"children's book illustration for: {group[:100]}"
+    return prompts
+
+
+def split_paragraphs(story):
+    """Split a story into its non-empty paragraphs"""
+    return [p for p in story.split('\n\n') if p.strip()]
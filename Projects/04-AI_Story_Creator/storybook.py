@@ -0,0 +1,81 @@
+"""
+Compact images and downloadable books for the Story Creator.
+
+Stable Diffusion returns large lossless images (about 1.5 MB for 1024x1024).
+They used to be embedded in the page as base64 and then base64-encoded a
+second time inside the HTML download link, so every picture was sent to the
+browser several times over. Here each picture is resized once to the display
+size and re-encoded as WebP or JPEG, and only those bytes are kept. The page
+shows them with st.image, and the book is offered as a zip of an HTML page
+plus its picture files, so nothing is base64-encoded.
+"""
+import io
+import zipfile
+
+from PIL import Image
+
+# Widest the story column shows a picture, in pixels
+DISPLAY_WIDTH = 768
+IMAGE_FORMAT = "WEBP"
+IMAGE_QUALITY = 80
+
+FILE_EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
+
+BOOK_TEMPLATE = """<html>
+<head>
+    <meta charset="utf-8">
+    <title>{title}</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 40px; }}
+        .story-text {{ font-size: 18px; line-height: 1.6; margin-bottom: 20px; }}
+        .story-image {{ max-width: 100%; height: auto; border-radius: 10px; margin: 20px 0; }}
+    </style>
+</head>
+<body>
+    <h1>{title}</h1>
+    {story_html}
+</body>
+</html>
+"""
+
+
+def compress_image(image_bytes, image_format=IMAGE_FORMAT, quality=IMAGE_QUALITY, max_width=DISPLAY_WIDTH):
+    """Resize an image to at most `max_width` pixels wide and re-encode it as WebP or JPEG."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image = image.convert("RGB")  # JPEG has no alpha channel
+        if image.width > max_width:
+            height = round(image.height * max_width / image.width)
+            image = image.resize((max_width, height), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, quality=quality)
+    return buffer.getvalue()
+
+
+def image_file_name(paragraph_index, image_format=IMAGE_FORMAT):
+    return f"images/picture_{paragraph_index + 1}.{FILE_EXTENSIONS[image_format]}"
+
+
+def build_book_html(paragraphs, image_names, title="My AI Story"):
+    """HTML page for the story. `image_names` maps a paragraph index to the picture shown above it."""
+    story_html = "".join(
+        (f'<img src="{image_names[i]}" class="story-image">' if i in image_names else "")
+        + f'<p class="story-text">{p}</p>'
+        for i, p in enumerate(paragraphs)
+    )
+    return BOOK_TEMPLATE.format(title=title, story_html=story_html)
+
+
+def build_book_zip(paragraphs, images, image_format=IMAGE_FORMAT, title="My AI Story"):
+    """
+    Zip with story.html and its pictures as separate files.
+    `images` maps a paragraph index to compressed image bytes.
+    """
+    image_names = {i: image_file_name(i, image_format) for i in images}
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as book:
+        book.writestr("story.html", build_book_html(paragraphs, image_names, title), compress_type=zipfile.ZIP_DEFLATED)
+        for i, image_bytes in images.items():
+            # Already compressed, so stored as is
+            book.writestr(image_names[i], image_bytes, compress_type=zipfile.ZIP_STORED)
+    return buffer.getvalue()
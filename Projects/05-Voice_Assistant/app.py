@@ -1,127 +1,273 @@
 import gradio as gr
-from openai import OpenAI
 from dotenv import load_dotenv
 import os
+import sys
+import asyncio
+import json
+import re
+from collections import deque
 from pathlib import Path
-import tempfile
-from elevenlabs import ElevenLabs, voices, save
+import threading
+import time
+from elevenlabs import voices, save
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI()
+# The shared Projects/llm_gateway package pools connections, rate limits and
+# retries the requests
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECTS_DIR not in sys.path:
+    sys.path.append(PROJECTS_DIR)
+import llm_gateway
+import audio_cache
+import tracing
 
-# Initialize ElevenLabs client
-elevenlabs_client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
+# The request pipeline uses the async clients, so a request waiting on the APIs
+# doesn't hold a worker thread
+async_client = llm_gateway.async_openai_client()
+async_elevenlabs_client = llm_gateway.async_elevenlabs_client()
 
-def speech_to_text(audio_file):
+# Only the voice list, refreshed in a background thread, uses the sync client
+elevenlabs_client = llm_gateway.elevenlabs_client()
+
+# How many requests Gradio runs at the same time. The handler is async, so
+# waiting requests are cheap coroutines on one event loop, not threads.
+CONCURRENCY_LIMIT = int(os.getenv("VOICE_CONCURRENCY", 256))
+
+# Sentences are spoken as soon as they are complete, while the rest of the reply
+# is still being written. This limits how many are synthesized at once, across
+# all users, so set it to your ElevenLabs plan's concurrency limit.
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", 3))
+tts_semaphore = asyncio.Semaphore(TTS_CONCURRENCY)
+
+# Models used for each stage of the pipeline
+STT_MODEL = "gpt-4o-transcribe"
+CHAT_MODEL = "gpt-4.1"
+TTS_MODEL = "eleven_monolingual_v1"
+
+# The ElevenLabs voice list is saved here, so the app starts without waiting
+# for the API (a separate file for the stub backend). It is refreshed in the
+# background once it is older than the TTL.
+VOICES_CACHE_PATH = Path(llm_gateway.cache_path(str(Path(__file__).parent / ".voices_cache.json")))
+VOICES_CACHE_TTL_SECONDS = int(os.getenv("VOICES_CACHE_TTL_SECONDS", 24 * 3600))
+FALLBACK_VOICES = [("Default (EXAVITQu4vr4xnSDxMaL)", "EXAVITQu4vr4xnSDxMaL")]
+voices_refresh_lock = threading.Lock()
+
+# End of a sentence: . ! or ? (optionally followed by quotes/brackets) and then whitespace
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+
+# Very short sentences ("Sure!") are joined with the next one, so speech flows better
+MIN_SENTENCE_CHARS = 20
+
+def take_sentences(buffer):
+    """
+    Split complete sentences off the front of streamed text.
+    Returns (sentences, remaining_text).
     """
-    Convert speech to text using OpenAI's transcription API
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(buffer):
+        sentence = buffer[start:match.end()].strip()
+        if len(sentence) >= MIN_SENTENCE_CHARS:
+            sentences.append(sentence)
+            start = match.end()
+    return sentences, buffer[start:]
+
+def fetch_voices():
+    """
+    Fetch the list of ElevenLabs voices from the API as (name, id) tuples
+    """
+    available_voices = elevenlabs_client.voices.get_all()
+    # Create a list of (name, id) tuples for the dropdown
+    return [(f"{voice.name} ({voice.voice_id})", voice.voice_id) for voice in available_voices.voices]
+
+def load_cached_voices():
+    """
+    Read the saved voice list. Returns (voices, saved_at), or (None, 0) if there is none
     """
     try:
-        with open(audio_file, "rb") as f:
-            transcription = client.audio.transcriptions.create(
-                model="gpt-4o-transcribe",
-                file=f,
-                response_format="text"
-            )
-        return transcription
+        with open(VOICES_CACHE_PATH, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        return [tuple(voice) for voice in cache["voices"]], cache["saved_at"]
+    except (OSError, ValueError, KeyError):
+        return None, 0
+
+def refresh_voices():
+    """
+    Fetch the voices from ElevenLabs and save them to the cache file.
+    If the API can't be reached, the old cache (if any) is kept.
+    """
+    if not voices_refresh_lock.acquire(blocking=False):
+        return  # Another refresh is already running
+    try:
+        voice_options = fetch_voices()
+        tmp_path = VOICES_CACHE_PATH.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"saved_at": time.time(), "voices": voice_options}, f)
+        tmp_path.replace(VOICES_CACHE_PATH)
     except Exception as e:
-        print(f"Error in speech_to_text: {e}")
-        raise
+        print(f"Error getting voices: {e}")
+    finally:
+        voices_refresh_lock.release()
+
+def get_available_voices():
+    """
+    Get list of available ElevenLabs voices.
+    Returns the cached list right away and refreshes it in the background
+    when it is missing or out of date, so this never waits for the API.
+    """
+    voice_options, saved_at = load_cached_voices()
+    if time.time() - saved_at > VOICES_CACHE_TTL_SECONDS:
+        threading.Thread(target=refresh_voices, daemon=True).start()
+    # Return a fallback voice until the first refresh has finished
+    return voice_options or FALLBACK_VOICES
+
+def get_default_voice(voice_options=None):
+    """
+    Get the first available voice as default
+    """
+    voice_options = voice_options or get_available_voices()
+    return voice_options[0][1]  # Return the first voice ID
+
+def update_voice_dropdown():
+    """
+    Refresh the dropdown on page load, so a voice list fetched in the
+    background shows up without restarting the app
+    """
+    voice_options = get_available_voices()
+    return gr.Dropdown(choices=voice_options, value=get_default_voice(voice_options))
 
-def get_chat_completion(user_message):
+async def speech_to_text(audio, filename):
     """
-    Get response from ChatGPT based on user input
+    Convert speech (the recording's bytes) to text using OpenAI's transcription API
     """
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4.1",
-            messages=[{"role": "user", "content": user_message}]
+        transcription = await async_client.audio.transcriptions.create(
+            model=STT_MODEL,
+            file=(filename, audio),
+            response_format="text"
         )
-        return completion.choices[0].message.content
+        return transcription
     except Exception as e:
-        print(f"Error in get_chat_completion: {e}")
+        print(f"Error in speech_to_text: {e}")
         raise
 
-def text_to_speech(text, voice="21m00Tcm4TlvDq8ikWAM"):
+async def stream_chat_completion(user_message):
     """
-    Convert text to speech using ElevenLabs TTS API
+    Stream the response from ChatGPT, yielding each piece of text as it arrives
     """
     try:
-        speech_file_path = Path(tempfile.gettempdir()) / "response.mp3"
-        
-        # Generate audio using ElevenLabs (returns a generator/stream)
-        audio_stream = elevenlabs_client.text_to_speech.convert(
-            text=text,
-            voice_id=voice,
-            model_id="eleven_monolingual_v1"
+        stream = await async_client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[{"role": "user", "content": user_message}],
+            stream=True
         )
-        
-        # Save the audio file from the generator/stream
-        with open(speech_file_path, "wb") as f:
-            for chunk in audio_stream:
-                f.write(chunk)
-        
-        return str(speech_file_path)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
     except Exception as e:
-        print(f"Error in text_to_speech: {e}")
+        print(f"Error in stream_chat_completion: {e}")
         raise
 
-def get_available_voices():
+async def synthesize_speech(text, voice="21m00Tcm4TlvDq8ikWAM"):
     """
-    Get list of available ElevenLabs voices
+    Convert text to MP3 audio bytes using ElevenLabs TTS API.
+    Sentences that were already spoken in this voice come from the audio cache,
+    and at most TTS_CONCURRENCY sentences are synthesized at once.
     """
-    try:
-        available_voices = elevenlabs_client.voices.get_all()
-        # Create a list of (name, id) tuples for the dropdown
-        voice_options = [(f"{voice.name} ({voice.voice_id})", voice.voice_id) for voice in available_voices.voices]
-        return voice_options
-    except Exception as e:
-        print(f"Error getting voices: {e}")
-        # Return a fallback voice if there's an error
-        return [("Default (EXAVITQu4vr4xnSDxMaL)", "EXAVITQu4vr4xnSDxMaL")]
+    # The cache is on disk, so it is read and written on worker threads
+    # instead of blocking the event loop for every other conversation
+    cache_key = audio_cache.cache_key(text, voice, TTS_MODEL)
+    audio = await asyncio.to_thread(audio_cache.get, cache_key)
+    if audio is not None:
+        return audio
 
-def get_default_voice():
+    async with tts_semaphore:
+        audio_stream = async_elevenlabs_client.text_to_speech.convert(
+            text=text,
+            voice_id=voice,
+            model_id=TTS_MODEL
+        )
+        audio = b"".join([chunk async for chunk in audio_stream])
+    await asyncio.to_thread(audio_cache.put, cache_key, audio)
+    return audio
+
+async def traced_speech(trace, text, voice):
     """
-    Get the first available voice as default
+    synthesize_speech() recorded as a "tts" span of the request's trace
     """
-    try:
-        voices = get_available_voices()
-        if voices:
-            return voices[0][1]  # Return the first voice ID
-        return "EXAVITQu4vr4xnSDxMaL"  # Fallback
-    except:
-        return "EXAVITQu4vr4xnSDxMaL"  # Fallback
+    with trace.span("tts", model=TTS_MODEL, chars_in=len(text)) as span:
+        audio = await synthesize_speech(text, voice)
+        span["audio_bytes_out"] = len(audio)
+    return audio
 
-def process_audio(audio_file, selected_voice):
+async def process_audio(audio_file, selected_voice):
     """
-    Main function that orchestrates the voice assistant workflow
+    Main function that orchestrates the voice assistant workflow, registered
+    as the Gradio handler. The three steps overlap: each sentence of the AI
+    response becomes an asyncio task that is sent to ElevenLabs as soon as it
+    is complete, and its audio is streamed to the browser while ChatGPT is
+    still writing the next sentences. Every step is timed as a span of the
+    request's trace (see tracing.py).
+    One event loop serves hundreds of conversations that are waiting on the APIs.
     """
+    trace = tracing.Trace()
+    pending_audio = deque()  # TTS tasks, in the order the sentences were spoken
     try:
-        print("audio_file:", audio_file)
-        print("selected_voice:", selected_voice)
-        
         # Step 1: Convert speech to text
-        transcription = speech_to_text(audio_file)
+        audio = await asyncio.to_thread(Path(audio_file).read_bytes)
+        with trace.span("transcription", model=STT_MODEL, audio_bytes_in=len(audio)) as span:
+            transcription = await speech_to_text(audio, os.path.basename(audio_file))
+            span["chars_out"] = len(transcription)
+        yield transcription, "", None
         
-        # Step 2: Get AI response
-        response = get_chat_completion(transcription)
-        
-        # Step 3: Convert response to speech using selected voice
-        speech_file_path = text_to_speech(response, selected_voice)
-        
-        return transcription, response, speech_file_path
+        # Step 2: Get AI response, showing it as it streams in
+        response = ""
+        buffer = ""
+        with trace.span("chat", model=CHAT_MODEL, chars_in=len(transcription)) as span:
+            async for text in stream_chat_completion(transcription):
+                trace.mark("first_token")
+                response += text
+                buffer += text
+
+                # Step 3: Convert each finished sentence to speech in the background
+                sentences, buffer = take_sentences(buffer)
+                for sentence in sentences:
+                    pending_audio.append(asyncio.create_task(traced_speech(trace, sentence, selected_voice)))
+
+                # Play any audio that is ready, keeping the sentences in order
+                audio_chunk = None
+                if pending_audio and pending_audio[0].done():
+                    audio_chunk = pending_audio.popleft().result()
+                    trace.mark("first_audio")
+                yield transcription, response, audio_chunk
+            span["chars_out"] = len(response)
+
+        # Speak whatever is left after the last full stop
+        if buffer.strip():
+            pending_audio.append(asyncio.create_task(traced_speech(trace, buffer.strip(), selected_voice)))
+        while pending_audio:
+            audio_chunk = await pending_audio.popleft()
+            trace.mark("first_audio")
+            yield transcription, response, audio_chunk
+        trace.mark("request")
     except Exception as e:
-        print("Error in process_audio:", e)
-        return "Error", "Error", "Error"
+        print(f"Error in process_audio (trace {trace.trace_id}):", e)
+        yield "Error", "Error", None
+    finally:
+        # Don't keep synthesizing speech for a user who has left
+        for task in pending_audio:
+            task.cancel()
 
 # Create Gradio interface
 with gr.Blocks(title="AI Voice Assistant") as demo:
     gr.Markdown("# 🎙️ AI Voice Assistant")
     gr.Markdown("Record your voice or upload an audio file to chat with the AI assistant.")
     
+    # Read from the local cache, so startup doesn't wait for ElevenLabs
+    initial_voices = get_available_voices()
+    
     with gr.Row():
         with gr.Column():
             audio_input = gr.Audio(
@@ -129,8 +275,8 @@ with gr.Blocks(title="AI Voice Assistant") as demo:
                 label="Record your voice"
             )
             voice_dropdown = gr.Dropdown(
-                choices=get_available_voices(),
-                value=get_default_voice(),
+                choices=initial_voices,
+                value=get_default_voice(initial_voices),
                 label="Select Voice",
                 info="Choose the voice for AI responses"
             )
@@ -139,13 +285,29 @@ with gr.Blocks(title="AI Voice Assistant") as demo:
         with gr.Column():
             transcription_output = gr.Textbox(label="Transcription")
             response_output = gr.Textbox(label="AI Response")
-            audio_output = gr.Audio(label="AI Voice Response", type="filepath")
+            audio_output = gr.Audio(label="AI Voice Response", streaming=True, autoplay=True)
     
     submit_btn.click(
         fn=process_audio,
         inputs=[audio_input, voice_dropdown],
-        outputs=[transcription_output, response_output, audio_output]
+        outputs=[transcription_output, response_output, audio_output],
+        concurrency_limit=CONCURRENCY_LIMIT
     )
+    
+    with gr.Accordion("Audio cache", open=False):
+        cache_stats_output = gr.JSON(label="Hit/miss counters and size on disk")
+        cache_stats_btn = gr.Button("Refresh stats")
+    
+    cache_stats_btn.click(fn=audio_cache.stats, outputs=cache_stats_output, api_name="audio_cache_stats")
+    
+    with gr.Accordion("Latency metrics", open=False):
+        metrics_output = gr.JSON(label="p50/p95/p99 per stage, in milliseconds")
+        metrics_btn = gr.Button("Refresh metrics")
+    
+    metrics_btn.click(fn=tracing.metrics, outputs=metrics_output, api_name="metrics")
+    
+    demo.load(fn=update_voice_dropdown, outputs=voice_dropdown)
 
 if __name__ == "__main__":
+    demo.queue(default_concurrency_limit=CONCURRENCY_LIMIT)
     demo.launch() 
\ No newline at end of file
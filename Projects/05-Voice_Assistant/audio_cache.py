@@ -0,0 +1,140 @@
+"""
+Disk cache of synthesized speech.
+
+Assistants repeat themselves (greetings, error messages, common answers), and
+each repeat would otherwise cost a full ElevenLabs request. Audio is stored
+under the SHA-256 of (text, voice_id, model_id), so the same sentence in the
+same voice is only synthesized once. The least recently used files are deleted
+once the cache grows past its size limit, and hit/miss counters show how well
+the cache is working.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import llm_gateway
+
+# Stub audio goes to its own folder (.audio_cache.stub), never into the real cache
+CACHE_DIR = llm_gateway.cache_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".audio_cache"))
+MAX_CACHE_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+
+# Requests run in parallel threads, so the counters are updated under a lock
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+# Bytes in the cache, counted once and then kept up to date by put(), so the
+# directory is only scanned again when the cache is over its limit
+_cache_bytes = None
+
+
+def cache_key(text, voice_id, model_id):
+    """SHA-256 of everything that changes the audio."""
+    fields = json.dumps([text, voice_id, model_id], ensure_ascii=False)
+    return hashlib.sha256(fields.encode("utf-8")).hexdigest()
+
+
+def cache_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.mp3")
+
+
+def get(key):
+    """Return the cached audio bytes, or None if this audio has not been made yet."""
+    global _hits, _misses
+    path = cache_path(key)
+    try:
+        with open(path, "rb") as f:
+            audio = f.read()
+        # Mark the entry as recently used so it is evicted last
+        os.utime(path)
+    except FileNotFoundError:
+        with _lock:
+            _misses += 1
+        return None
+
+    with _lock:
+        _hits += 1
+    return audio
+
+
+def put(key, audio):
+    """Store audio bytes and evict old entries if needed."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # Write to a unique temporary file first, so parallel requests for the
+    # same sentence never see half a file
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, cache_path(key))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    global _cache_bytes
+    with _lock:
+        if _cache_bytes is not None:
+            # Overwriting an existing entry counts it twice, which only makes eviction come earlier
+            _cache_bytes += len(audio)
+        over_limit = _cache_bytes is None or _cache_bytes > MAX_CACHE_BYTES
+    if over_limit:
+        evict()
+
+
+def evict(max_bytes=None):
+    """Delete least recently used entries until the cache fits in `max_bytes` (default MAX_CACHE_BYTES)."""
+    global _cache_bytes
+    if max_bytes is None:
+        max_bytes = MAX_CACHE_BYTES
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".mp3"):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue  # Removed by another request
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+    with _lock:
+        _cache_bytes = total
+
+
+def stats():
+    """Hit/miss counters since startup and the cache's current size on disk."""
+    entries, total_bytes = 0, 0
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith(".mp3"):
+                try:
+                    total_bytes += os.path.getsize(os.path.join(CACHE_DIR, name))
+                    entries += 1
+                except FileNotFoundError:
+                    pass
+
+    with _lock:
+        hits, misses = _hits, _misses
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        "entries": entries,
+        "bytes": total_bytes,
+        "max_bytes": MAX_CACHE_BYTES,
+    }
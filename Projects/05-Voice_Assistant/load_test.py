@@ -0,0 +1,170 @@
+"""
+Load test for the Voice Assistant with stubbed providers.
+
+OpenAI and ElevenLabs are replaced by stubs that only sleep for a realistic
+time, so no API keys or credits are needed. The test runs many requests
+through the process_audio() handler as coroutines on one event loop, the same
+way Gradio runs it.
+
+It reports throughput and the peak number of threads for each concurrency
+level, checks that no request received another request's text or audio, and
+prints the per-stage latency percentiles recorded by tracing.py.
+
+Each level runs twice: with the app's TTS_CONCURRENCY limit, which is what the
+shipped app delivers (ElevenLabs caps it), and with a TTS limit high enough
+that it never waits, which shows how far the rest of the pipeline scales.
+
+Usage:
+    python load_test.py                 # 48 requests at concurrency 1, 4, 16
+    python load_test.py 512 1 64 256    # custom request count and levels
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+# The app creates its clients at import time, which needs some key
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("ELEVENLABS_API_KEY", "stub")
+
+import app
+import audio_cache
+import tracing
+
+# Simulated provider latencies in seconds
+STT_LATENCY = 0.3
+CHAT_FIRST_TOKEN_LATENCY = 0.3
+CHAT_TOKEN_LATENCY = 0.01
+TTS_LATENCY = 0.4
+
+peak_threads = 0
+
+
+def make_reply(question):
+    return f"You asked about {question}. Here is a first sentence. And here is the second one for {question}."
+
+
+def chat_chunk(word):
+    delta = SimpleNamespace(content=word + " ")
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class StubTranscriptions:
+    async def create(self, model, file, response_format):
+        await asyncio.sleep(STT_LATENCY)
+        # The "audio" file just contains the question text
+        filename, audio = file
+        return audio.decode("utf-8")
+
+
+class StubCompletions:
+    async def create(self, model, messages, stream=False):
+        reply = make_reply(messages[-1]["content"])
+
+        async def chunks():
+            await asyncio.sleep(CHAT_FIRST_TOKEN_LATENCY)
+            for word in reply.split(" "):
+                await asyncio.sleep(CHAT_TOKEN_LATENCY)
+                yield chat_chunk(word)
+        return chunks()
+
+
+class StubTextToSpeech:
+    # Like the real SDK, convert() is an async generator and isn't awaited
+    async def convert(self, text, voice_id, model_id):
+        await asyncio.sleep(TTS_LATENCY)
+        yield text.encode("utf-8")
+
+
+def install_stubs():
+    app.async_client = SimpleNamespace(
+        audio=SimpleNamespace(transcriptions=StubTranscriptions()),
+        chat=SimpleNamespace(completions=StubCompletions())
+    )
+    app.async_elevenlabs_client = SimpleNamespace(text_to_speech=StubTextToSpeech())
+    # Keep the stub audio out of the real audio cache, and stub spans out of the trace file
+    audio_cache.CACHE_DIR = tempfile.mkdtemp(prefix="voice_load_test_audio_")
+    tracing.TRACE_PATH = None
+
+
+def record_threads():
+    global peak_threads
+    peak_threads = max(peak_threads, threading.active_count())
+
+
+def check_response(question, transcription, response, audio):
+    # Every request must get back exactly its own text and audio
+    assert transcription == question, f"wrong transcription: {transcription!r}"
+    assert question in response, f"response for another request: {response!r}"
+    assert audio.decode("utf-8").replace(" ", "") == response.replace(" ", ""), "audio doesn't match response"
+
+
+async def run_request(audio_path, question, limit):
+    async with limit:
+        transcription, response, audio = None, None, b""
+        async for transcription, response, audio_chunk in app.process_audio(audio_path, "stub-voice"):
+            record_threads()
+            if audio_chunk:
+                audio += audio_chunk
+    check_response(question, transcription, response, audio)
+
+
+async def run_level(audio_files, concurrency, tts_limit):
+    # A new semaphore for each event loop
+    app.tts_semaphore = asyncio.Semaphore(tts_limit)
+    # Plays the role of Gradio's concurrency_limit
+    limit = asyncio.Semaphore(concurrency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_request(path, question, limit) for path, question in audio_files))
+    return time.perf_counter() - start
+
+
+def main():
+    global peak_threads
+    args = sys.argv[1:]
+    requests = int(args[0]) if args else 48
+    levels = [int(level) for level in args[1:]] or [1, 4, 16]
+
+    install_stubs()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        audio_files = []
+        for i in range(requests):
+            question = f"topic {i}"
+            path = os.path.join(tmp_dir, f"question_{i}.wav")
+            with open(path, "wb") as f:
+                f.write(question.encode("utf-8"))
+            audio_files.append((path, question))
+
+        print(f"{requests} requests")
+        print(f"{'concurrency':>11} {'TTS limit':>10} {'seconds':>8} {'requests/s':>11} {'threads':>8}")
+        baselines = {}
+        for concurrency in levels:
+            # The configured limit, then one that never waits (3 sentences per request)
+            for label, tts_limit in (("configured", app.TTS_CONCURRENCY), ("none", concurrency * 3)):
+                # Start every run with an empty audio cache, so runs are comparable
+                shutil.rmtree(audio_cache.CACHE_DIR, ignore_errors=True)
+                peak_threads = 0
+                elapsed = asyncio.run(run_level(audio_files, concurrency, tts_limit))
+                throughput = requests / elapsed
+                baseline = baselines.setdefault(label, throughput)
+                limit_text = str(tts_limit) if label == "configured" else "none"
+                print(
+                    f"{concurrency:>11} {limit_text:>10} {elapsed:>8.2f} {throughput:>11.2f} {peak_threads:>8}"
+                    f"   ({throughput / baseline:.1f}x)"
+                )
+
+    print("\nAll responses matched their own requests.")
+    print("Audio cache:", audio_cache.stats())
+    print("\nLatency per stage, all levels:")
+    tracing.print_summary(tracing.metrics())
+    shutil.rmtree(audio_cache.CACHE_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
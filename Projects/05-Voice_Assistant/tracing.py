@@ -0,0 +1,172 @@
+"""
+Per-stage latency tracing for the voice pipeline.
+
+Each stage of a request (transcription, chat completion, each sentence of
+speech) is recorded as a span with its duration, payload sizes and model.
+Spans are kept in memory, where they are summarized as p50/p95/p99 latencies
+per stage, and appended to a JSONL trace file by a background thread, so
+recording a span never waits for the disk. That shows which stage to
+optimize first when the assistant feels slow.
+
+Run `python tracing.py` to summarize the spans saved in the trace file.
+"""
+import atexit
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Set VOICE_TRACE_FILE to an empty value to only keep spans in memory
+TRACE_PATH = os.getenv("VOICE_TRACE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".traces.jsonl"))
+
+# Recent spans per stage that the percentiles are computed from
+MAX_SPANS_PER_STAGE = 1000
+
+# Spans finish in parallel threads and tasks, so updates are serialized
+_lock = threading.Lock()
+_durations = defaultdict(lambda: deque(maxlen=MAX_SPANS_PER_STAGE))
+
+# Spans waiting to be written to the trace file
+_unwritten = queue.SimpleQueue()
+_write_lock = threading.Lock()
+_writer = None
+
+
+class Trace:
+    """All spans of one request, grouped under a short random ID."""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.start = time.perf_counter()
+        self.marked = set()
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self.start) * 1000, 1)
+
+    @contextmanager
+    def span(self, stage, model=None, **attributes):
+        """
+        Time the block as one span. Yields a dict that the block can add
+        payload sizes to, e.g. span["chars_out"] = len(text).
+        """
+        record = {"trace_id": self.trace_id, "stage": stage, "model": model, **attributes}
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            record["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            record["time"] = time.time()
+            _record(record)
+
+    def mark(self, stage, **attributes):
+        """
+        Record the time since the request started, the first time `stage` is
+        reached, e.g. when the first audio was ready.
+        """
+        if stage in self.marked:
+            return
+        self.marked.add(stage)
+        _record({"trace_id": self.trace_id, "stage": stage, "duration_ms": self.elapsed_ms(),
+                 "time": time.time(), **attributes})
+
+
+def _record(record):
+    global _writer
+    with _lock:
+        _durations[record["stage"]].append(record["duration_ms"])
+        if TRACE_PATH and _writer is None:
+            _writer = threading.Thread(target=_write_forever, daemon=True)
+            _writer.start()
+    if TRACE_PATH:
+        _unwritten.put(record)
+
+
+def _write_forever():
+    while True:
+        # Wait for a span, then write it together with any others that are
+        # waiting. The lock is held meanwhile, so flush() can't miss a span
+        # this thread has already taken.
+        with _write_lock:
+            try:
+                records = [_unwritten.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            _write(records)
+
+
+def _write(records):
+    while True:
+        try:
+            records.append(_unwritten.get_nowait())
+        except queue.Empty:
+            break
+    if records and TRACE_PATH:
+        with open(TRACE_PATH, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+
+
+@atexit.register
+def flush():
+    """Write the spans that are still waiting to the trace file."""
+    with _write_lock:
+        _write([])
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(durations_by_stage):
+    """{stage: [duration_ms, ...]} -> {stage: {count, mean, p50, p95, p99}}."""
+    summary = {}
+    for stage, durations in durations_by_stage.items():
+        values = sorted(durations)
+        if not values:
+            continue
+        summary[stage] = {
+            "count": len(values),
+            "mean_ms": round(sum(values) / len(values), 1),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "p99_ms": percentile(values, 99),
+        }
+    return summary
+
+
+def metrics():
+    """Latency percentiles per stage for the spans recorded since startup."""
+    with _lock:
+        durations = {stage: list(values) for stage, values in _durations.items()}
+    return summarize(durations)
+
+
+def load_trace_file(path=TRACE_PATH):
+    """Read the durations per stage back from a trace file."""
+    durations = defaultdict(list)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            durations[record["stage"]].append(record["duration_ms"])
+    return durations
+
+
+def print_summary(summary):
+    print(f"{'stage':<14} {'count':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)")
+    for stage, stats in summary.items():
+        print(f"{stage:<14} {stats['count']:>6} {stats['mean_ms']:>8} {stats['p50_ms']:>8} "
+              f"{stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+
+
+if __name__ == "__main__":
+    print_summary(summarize(load_trace_file(sys.argv[1] if len(sys.argv) > 1 else TRACE_PATH)))
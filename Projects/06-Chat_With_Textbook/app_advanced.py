@@ -1,17 +1,29 @@
 import streamlit as st
-from PyPDF2 import PdfReader
-from pdf2image import convert_from_path
-from PIL import Image
-import base64
 import os
-import io
-import openai
+import sys
 from dotenv import load_dotenv
-import tiktoken
+
+# Make the shared Projects/llm_gateway package importable. Streamlit reruns
+# this script on every interaction, so the path is only added once.
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECTS_DIR not in sys.path:
+    sys.path.append(PROJECTS_DIR)
+
+import book_index
+import extraction_cache
+import ocr_pipeline
+import token_counter
+import history_manager
+import book_store
+import llm_gateway
 
 # Load environment variables
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# Answers to repeated questions, stored next to this script
+answer_cache = llm_gateway.open_answer_cache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".answer_cache.sqlite3")
+)
 
 BOOKS_DIR = "scanned_books"
 os.makedirs(BOOKS_DIR, exist_ok=True)
@@ -19,71 +31,80 @@ os.makedirs(BOOKS_DIR, exist_ok=True)
 st.set_page_config(page_title="📚 Chat With Your Textbook", layout="wide")
 st.title("📚 Chat With Your Textbook")
 
-# Vision OCR helper
-def extract_text_with_gpt4o(image):
-    buffered = io.BytesIO()
-    image.save(buffered, format="PNG")
-    image_bytes = buffered.getvalue()
-    image_base64 = base64.b64encode(image_bytes).decode("utf-8")
-
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_base64}"}},
-                        {"type": "text", "text": "Extract all readable text from this image."}
-                    ]
-                }
-            ],
-            max_tokens=1000
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"[Error] {str(e)}"
-
-# PDF text extractor
-def extract_text_from_pdf(pdf_path):
-    text = ""
-    try:
-        reader = PdfReader(pdf_path)
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-    except Exception as e:
-        st.error(f"Failed to extract text from PDF: {e}")
-    return text
-
-# Token counter
-def count_tokens(text, model="gpt-4o"):
-    encoding = tiktoken.encoding_for_model(model)
-    return len(encoding.encode(text))
+# Retrieval mode sends only the most relevant passages with each question,
+# so there is no limit on the book size
+retrieval_mode = st.sidebar.checkbox("Retrieval mode (send only relevant passages)", value=True)
+top_k = st.sidebar.slider("Passages per question", 1, 10, 5, disabled=not retrieval_mode)
+use_embeddings = st.sidebar.checkbox("Also build an embedding index when saving", value=False)
+
+# How many GPT-4o Vision requests to run at the same time for scanned books
+ocr_concurrency = st.sidebar.slider("Parallel OCR requests", 1, 16, 4)
+
+# Older messages are summarized once the conversation grows past this many tokens
+history_budget = st.sidebar.slider("Conversation memory (tokens)", 1000, 16000, history_manager.HISTORY_TOKEN_BUDGET, step=500)
+
+# Answer repeated questions from a local cache instead of calling the model again
+use_answer_cache = st.sidebar.checkbox("Reuse answers to repeated questions", value=True)
 
 # Upload section
 st.header("📖 Upload a Book")
 uploaded_file = st.file_uploader("Upload a scanned or text-based PDF", type=["pdf"])
 
 if uploaded_file is not None:
-    with open("temp.pdf", "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    # Reuse the text (including any OCR) if this exact PDF was already processed
+    pdf_hash = extraction_cache.file_hash(uploaded_file.getvalue())
+    extracted_text = extraction_cache.get(pdf_hash, "hybrid")
+
+    if extracted_text is None:
+        with open("temp.pdf", "wb") as f:
+            f.write(uploaded_file.getbuffer())
+
+        st.info("Extracting text from PDF...")
+        extraction_ok = True
+        text_progress = st.progress(0.0, text="Reading PDF...")
+        ocr_progress = st.progress(0.0, text="Pages without embedded text will be OCR'd with GPT-4o Vision")
+
+        def show_text_progress(page_number, total_pages):
+            text_progress.progress(page_number / total_pages, text=f"Extracted page {page_number} of {total_pages}")
 
-    st.info("Extracting text from PDF...")
-    extracted_text = extract_text_from_pdf("temp.pdf")
+        def show_ocr_progress(pages_done, total_pages):
+            ocr_progress.progress(pages_done / total_pages, text=f"OCR: {pages_done} of {total_pages} pages done")
 
-    if not extracted_text.strip():
-        st.warning("No embedded text found. Using GPT-4o Vision OCR...")
+        # Each page uses its embedded text if it has enough, otherwise GPT-4o Vision OCR.
+        # Pages are written straight into the cache file, in page order.
+        stats = {}
         try:
-            images = convert_from_path("temp.pdf", dpi=100)
-            for i, image in enumerate(images):
-                st.write(f"Processing page {i+1}...")
-                image.thumbnail((1024, 1024), Image.Resampling.LANCZOS)
-                extracted = extract_text_with_gpt4o(image)
-                extracted_text += extracted + "\n\n"
+            with extraction_cache.open_entry(pdf_hash, "hybrid") as text_file:
+                for page_number, page_text, source in ocr_pipeline.iter_hybrid_pages(
+                    "temp.pdf",
+                    concurrency=ocr_concurrency,
+                    text_progress=show_text_progress,
+                    ocr_progress=show_ocr_progress,
+                    stats=stats
+                ):
+                    if source == "ocr" and page_text.startswith("[Error]"):
+                        extraction_ok = False
+                    if page_text.strip():
+                        text_file.write(page_text + ("\n\n" if source == "ocr" else "\n"))
         except Exception as e:
-            st.error(f"Error converting PDF to images: {e}")
+            extraction_ok = False
+            st.error(f"Failed to extract text from PDF: {e}")
+        text_progress.empty()
+        ocr_progress.empty()
+
+        if stats.get("ocr") or stats.get("blank") or stats.get("duplicate"):
+            st.caption(
+                f"{stats.get('text', 0)} pages had embedded text, {stats['ocr']} pages were OCR'd, "
+                f"{stats['blank']} blank pages were skipped and {stats['duplicate']} repeated pages reused earlier OCR text."
+            )
+
+        extracted_text = extraction_cache.get(pdf_hash, "hybrid") or ""
+
+        # Don't keep failed OCR runs in the cache, so they are retried next time
+        if not extraction_ok:
+            extraction_cache.discard(pdf_hash, "hybrid")
+    else:
+        st.info("Loaded previously extracted text for this PDF.")
 
     st.subheader("Extracted Text")
     st.text_area("Text from PDF", extracted_text, height=300)
@@ -93,61 +114,110 @@ if uploaded_file is not None:
         if not book_name.strip():
             st.error("Please enter a valid book name.")
         else:
-            book_path = os.path.join(BOOKS_DIR, f"{book_name.strip()}.txt")
-            if os.path.exists(book_path):
+            if book_store.book_exists(BOOKS_DIR, book_name.strip()):
                 st.warning("A book with this name already exists. Please choose a different name.")
             else:
-                with open(book_path, "w", encoding="utf-8") as f:
-                    f.write(extracted_text)
+                book_path = book_store.save_book(BOOKS_DIR, book_name.strip(), extracted_text)
+                # Count tokens once now instead of on every rerun of the chat
+                token_counter.save_book_meta(book_path, extracted_text)
+                with st.spinner("Building search index..."):
+                    try:
+                        book_index.build_index(book_path, extracted_text, with_embeddings=use_embeddings)
+                    except Exception as e:
+                        st.warning(f"Search index could not be fully built: {e}")
                 st.success(f"Book '{book_name}' saved successfully!")
 
 # Chat section
 st.header("💬 Chat with Your Books")
 
-books = [f[:-4] for f in os.listdir(BOOKS_DIR) if f.endswith(".txt")]
+books = book_store.list_books(BOOKS_DIR)
 
 if not books:
     st.info("No books found. Please upload a book first.")
 else:
     selected_book = st.selectbox("Choose a book to chat with:", books)
-    book_path = os.path.join(BOOKS_DIR, f"{selected_book}.txt")
-    with open(book_path, "r", encoding="utf-8") as f:
-        book_content = f.read()
+    book_path = book_store.book_path(BOOKS_DIR, selected_book)
 
-    tokens = count_tokens(book_content)
+    # Token count comes from the book's saved metadata, not from re-encoding it
+    book_meta = token_counter.get_book_meta(book_path)
+    tokens = book_meta["tokens"]
     max_tokens_limit = 120000
 
-    if tokens > max_tokens_limit:
+    if tokens > max_tokens_limit and not retrieval_mode:
         st.error(f"Book content too large for the model ({tokens} tokens). Please shorten or split the book.")
     else:
-        st.caption(f"Book length: {len(book_content)} characters (~{tokens} tokens)")
+        # Initialize or update chat history when book or retrieval mode changes
+        chat_key = (selected_book, retrieval_mode)
+        if "chat_history" not in st.session_state or "current_book" not in st.session_state or st.session_state.current_book != chat_key:
+            st.session_state.chat_history = history_manager.ChatHistory()
+            st.session_state.current_book = chat_key
+
+        # The session only stores the book's ID; the book text itself is loaded
+        # once per server and shared by every session
+        if retrieval_mode:
+            system_prompt = f"You are a helpful assistant that answers questions about the book '{selected_book}' using the passages provided with each question."
+        else:
+            system_prompt = book_store.full_book_prompt(BOOKS_DIR, selected_book)
+
+        chat_history = st.session_state.chat_history
+        chat_history.budget = history_budget
 
-        # Initialize or update chat history when book changes
-        if "chat_history" not in st.session_state or "current_book" not in st.session_state or st.session_state.current_book != selected_book:
-            st.session_state.chat_history = [
-                {"role": "system", "content": f"You are a helpful assistant that answers questions based on the following book:\n\n{book_content}"}
-            ]
-            st.session_state.current_book = selected_book
+        # Tokens of the system message sent with each question. The book's share
+        # comes from its saved token count, so the book is never re-encoded.
+        if retrieval_mode:
+            chat_history.system_tokens = token_counter.count_message_tokens({"content": system_prompt})
+        else:
+            chat_history.system_tokens = token_counter.count_message_tokens({"content": book_store.FULL_BOOK_PROMPT}) + tokens
+
+        st.caption(
+            f"Book length: {book_meta['characters']} characters (~{tokens} tokens) · "
+            f"Conversation sent per question: ~{chat_history.history_tokens} tokens"
+        )
 
-        for msg in st.session_state.chat_history[1:]:
+        for msg in chat_history.messages:
             with st.chat_message(msg["role"]):
                 st.markdown(msg["content"])
 
         if user_question := st.chat_input("Ask a question about the book"):
-            st.session_state.chat_history.append({"role": "user", "content": user_question})
+            chat_history.add("user", user_question)
             with st.chat_message("user"):
                 st.markdown(user_question)
 
             with st.chat_message("assistant"):
-                with st.spinner("Generating response..."):
-                    try:
-                        response = openai.chat.completions.create(
-                            model="gpt-4o",
-                            messages=st.session_state.chat_history,
-                            temperature=0.2
-                        )
-                        answer = response.choices[0].message.content
+                try:
+                    # Questions are cached per book version and per conversation so far,
+                    # so the same question in the same situation is answered instantly
+                    book_version = book_store.get_entry(BOOKS_DIR, selected_book)["sha256"][:12]
+                    cache_namespace = f"{selected_book}:{book_version}:{chat_history.context_key()}"
+                    answer = answer_cache.get(cache_namespace, user_question) if use_answer_cache else None
+
+                    if answer is not None:
                         st.markdown(answer)
-                        st.session_state.chat_history.append({"role": "assistant", "content": answer})
-                    except Exception as e:
-                        st.error(f"OpenAI API error: {e}")
+                        st.caption("⚡ Answered from cache")
+                    else:
+                        with st.spinner("Generating response..."):
+                            question_prompt = None
+                            if retrieval_mode:
+                                # Attach the relevant passages to this question only, so they don't pile up in the history
+                                question_prompt = book_index.build_question_prompt(book_path, user_question, top_k)
+                            messages = chat_history.request_messages(system_prompt, question_prompt)
+
+                            stream = llm_gateway.openai_client().chat.completions.create(
+                                model="gpt-4o",
+                                messages=messages,
+                                temperature=0.2,
+                                stream=True
+                            )
+                        # Show the answer as it is generated; the full text is returned at the end
+                        answer = st.write_stream(stream)
+                        answer_cache.put(cache_namespace, user_question, answer)
+                    chat_history.add("assistant", answer)
+                except Exception as e:
+                    st.error(f"OpenAI API error: {e}")
+
+                # Keep the next request small by summarizing older turns
+                try:
+                    with st.spinner("Summarizing older messages..."):
+                        chat_history.compact()
+                except Exception as e:
+                    st.warning(f"Could not summarize older messages: {e}")
@@ -1,12 +1,30 @@
 import streamlit as st
-from PyPDF2 import PdfReader
 import os
-import openai
+import sys
 from dotenv import load_dotenv
 
+# Make the shared Projects/llm_gateway package importable. Streamlit reruns
+# this script on every interaction, so the path is only added once.
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECTS_DIR not in sys.path:
+    sys.path.append(PROJECTS_DIR)
+
+import book_index
+import extraction_cache
+import pdf_extraction
+import token_counter
+import history_manager
+import book_store
+import llm_gateway
+
 # Load environment variables
 load_dotenv()
 
+# Answers to repeated questions, stored next to this script
+answer_cache = llm_gateway.open_answer_cache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".answer_cache.sqlite3")
+)
+
 # Create books directory
 BOOKS_DIR = "scanned_books"
 os.makedirs(BOOKS_DIR, exist_ok=True)
@@ -15,30 +33,29 @@ os.makedirs(BOOKS_DIR, exist_ok=True)
 st.set_page_config(page_title="📚 Chat With Your Textbook", layout="wide")
 st.title("📚 Chat With Your Textbook")
 
-# Simple function to extract text from PDF
-def extract_text_from_pdf(pdf_path):
-    try:
-        text = ""
-        reader = PdfReader(pdf_path)
-        total_pages = len(reader.pages)
-        
-        # Simple progress message
-        progress_text = st.empty()
-        progress_text.text(f"Processing {total_pages} pages...")
-        
-        # Process each page with a simple counter
-        page_number = 1
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-            page_number = page_number + 1
-        
-        progress_text.empty()
-        return text
-    except Exception as e:
-        st.error(f"Error extracting text from PDF: {str(e)}")
-        return ""
+# Retrieval mode sends only the most relevant passages with each question
+retrieval_mode = st.sidebar.checkbox("Retrieval mode (send only relevant passages)", value=True)
+top_k = st.sidebar.slider("Passages per question", 1, 10, 5, disabled=not retrieval_mode)
+
+# Older messages are summarized once the conversation grows past this many tokens
+history_budget = st.sidebar.slider("Conversation memory (tokens)", 1000, 16000, history_manager.HISTORY_TOKEN_BUDGET, step=500)
+
+# Answer repeated questions from a local cache instead of calling the model again
+use_answer_cache = st.sidebar.checkbox("Reuse answers to repeated questions", value=True)
+
+# Extract text from PDF, writing each page straight into `out_file`
+def extract_text_from_pdf(pdf_path, out_file):
+    # Progress bar that shows which page we are on
+    progress_bar = st.progress(0.0, text="Reading PDF...")
+
+    def show_progress(page_number, total_pages):
+        progress_bar.progress(page_number / total_pages, text=f"Extracted page {page_number} of {total_pages}")
+
+    # Pages are extracted in parallel on all CPU cores
+    pages_written = pdf_extraction.write_pages(pdf_path, out_file, progress_callback=show_progress)
+
+    progress_bar.empty()
+    return pages_written
 
 # Upload section
 st.header("📖 Upload a Book")
@@ -46,10 +63,18 @@ uploaded_file = st.file_uploader("Upload a PDF with digital text", type=["pdf"])
 
 if uploaded_file is not None:
     try:
-        with open("temp.pdf", "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
-        extracted_text = extract_text_from_pdf("temp.pdf")
+        # Reuse the text if this exact PDF was already extracted (e.g. on a rerun)
+        pdf_hash = extraction_cache.file_hash(uploaded_file.getvalue())
+        extracted_text = extraction_cache.get(pdf_hash, "text")
+
+        if extracted_text is None:
+            with open("temp.pdf", "wb") as f:
+                f.write(uploaded_file.getbuffer())
+
+            # Pages are written straight into the cache file as they are extracted
+            with extraction_cache.open_entry(pdf_hash, "text") as text_file:
+                extract_text_from_pdf("temp.pdf", text_file)
+            extracted_text = extraction_cache.get(pdf_hash, "text")
 
         if not extracted_text.strip():
             st.error("No text found in this PDF. Please upload a PDF with digital text.")
@@ -60,9 +85,9 @@ if uploaded_file is not None:
                 if not book_name.strip():
                     st.error("Please enter a book name.")
                 else:
-                    book_path = os.path.join(BOOKS_DIR, f"{book_name.strip()}.txt")
-                    with open(book_path, "w", encoding="utf-8") as f:
-                        f.write(extracted_text)
+                    book_path = book_store.save_book(BOOKS_DIR, book_name.strip(), extracted_text)
+                    book_index.build_index(book_path, extracted_text)
+                    token_counter.save_book_meta(book_path, extracted_text)
                     st.success(f"Book '{book_name}' saved successfully!")
     except Exception as e:
         st.error(f"Error processing uploaded file: {str(e)}")
@@ -70,52 +95,89 @@ if uploaded_file is not None:
 # Chat section
 st.header("💬 Chat with Your Books")
 
-# Get list of books from the directory
-books = []
-for f in os.listdir(BOOKS_DIR):
-    if f.endswith(".txt"):
-        # Remove the last 4 characters (.txt) to get just the book name
-        book_name = f[:-4]
-        books.append(book_name)
+# Get list of books from the book store's manifest
+books = book_store.list_books(BOOKS_DIR)
 
 if not books:
     st.info("No books found. Please upload a book first.")
 else:
     selected_book = st.selectbox("Choose a book to chat with:", books)
-    book_path = os.path.join(BOOKS_DIR, f"{selected_book}.txt")
-    
-    with open(book_path, "r", encoding="utf-8") as f:
-        book_content = f.read()
+    book_path = book_store.book_path(BOOKS_DIR, selected_book)
 
     # Initialize or reset chat history when:
     # 1. No chat history exists (first time), OR
     # 2. No current book is tracked, OR  
-    # 3. User switched to a different book
+    # 3. User switched to a different book or retrieval mode
     # This ensures each book gets its own conversation context
-    if "chat_history" not in st.session_state or "current_book" not in st.session_state or st.session_state.current_book != selected_book:
-        st.session_state.chat_history = [
-            {"role": "system", "content": f"You are a helpful assistant that answers questions based on the following book:\n\n{book_content}"}
-        ]
-        st.session_state.current_book = selected_book
+    chat_key = (selected_book, retrieval_mode)
+    if "chat_history" not in st.session_state or "current_book" not in st.session_state or st.session_state.current_book != chat_key:
+        st.session_state.chat_history = history_manager.ChatHistory()
+        st.session_state.current_book = chat_key
+
+    # The session only stores the book's ID; the book text itself is loaded
+    # once per server and shared by every session
+    if retrieval_mode:
+        system_prompt = f"You are a helpful assistant that answers questions about the book '{selected_book}' using the passages provided with each question."
+    else:
+        system_prompt = book_store.full_book_prompt(BOOKS_DIR, selected_book)
+
+    chat_history = st.session_state.chat_history
+    chat_history.budget = history_budget
+
+    # Tokens of the system message sent with each question. The book's share
+    # comes from its saved token count, so the book is never re-encoded.
+    if retrieval_mode:
+        chat_history.system_tokens = token_counter.count_message_tokens({"content": system_prompt})
+    else:
+        book_tokens = token_counter.get_book_meta(book_path)["tokens"]
+        chat_history.system_tokens = token_counter.count_message_tokens({"content": book_store.FULL_BOOK_PROMPT}) + book_tokens
 
     # Display chat history
-    for msg in st.session_state.chat_history[1:]:
+    for msg in chat_history.messages:
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
 
     # Chat input
     if user_question := st.chat_input("Ask a question about the book"):
-        st.session_state.chat_history.append({"role": "user", "content": user_question})
+        chat_history.add("user", user_question)
         with st.chat_message("user"):
             st.markdown(user_question)
 
         with st.chat_message("assistant"):
-            with st.spinner("Generating response..."):
-                response = openai.chat.completions.create(
-                    model="gpt-4o",
-                    messages=st.session_state.chat_history,
-                    temperature=0.2
-                )
-                answer = response.choices[0].message.content
-                st.markdown(answer)
-                st.session_state.chat_history.append({"role": "assistant", "content": answer}) 
\ No newline at end of file
+            try:
+                # Questions are cached per book version and per conversation so far,
+                # so the same question in the same situation is answered instantly
+                book_version = book_store.get_entry(BOOKS_DIR, selected_book)["sha256"][:12]
+                cache_namespace = f"{selected_book}:{book_version}:{chat_history.context_key()}"
+                answer = answer_cache.get(cache_namespace, user_question) if use_answer_cache else None
+
+                if answer is not None:
+                    st.markdown(answer)
+                    st.caption("⚡ Answered from cache")
+                else:
+                    with st.spinner("Generating response..."):
+                        question_prompt = None
+                        if retrieval_mode:
+                            # Attach the relevant passages to this question only, so they don't pile up in the history
+                            question_prompt = book_index.build_question_prompt(book_path, user_question, top_k)
+                        messages = chat_history.request_messages(system_prompt, question_prompt)
+
+                        stream = llm_gateway.openai_client().chat.completions.create(
+                            model="gpt-4o",
+                            messages=messages,
+                            temperature=0.2,
+                            stream=True
+                        )
+                    # Show the answer as it is generated; the full text is returned at the end
+                    answer = st.write_stream(stream)
+                    answer_cache.put(cache_namespace, user_question, answer)
+                chat_history.add("assistant", answer)
+            except Exception as e:
+                st.error(f"OpenAI API error: {e}")
+
+            # Keep the next request small by summarizing older turns
+            try:
+                with st.spinner("Summarizing older messages..."):
+                    chat_history.compact()
+            except Exception as e:
+                st.warning(f"Could not summarize older messages: {e}") 
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""
+Local retrieval index for saved books.
+
+When a book is saved we split it into overlapping chunks and build a BM25
+index next to the book's .txt file in scanned_books/. Each question then only
+sends the few most relevant chunks to the model instead of the whole book.
+
+Optionally an embedding index (OpenAI embeddings) can be built as well; when it
+exists, BM25 and embedding results are merged with reciprocal rank fusion.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+import llm_gateway
+
+# Chunking settings (measured in words)
+CHUNK_WORDS = 250
+CHUNK_OVERLAP = 50
+
+# BM25 tuning constants (standard values)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "he",
+    "in", "is", "it", "its", "of", "on", "or", "that", "the", "to", "was", "were",
+    "will", "with", "this", "what", "which", "who", "how", "why", "does", "do",
+}
+
+
+def tokenize(text):
+    """Lowercase words without stopwords, used for both chunks and questions."""
+    return [word for word in re.findall(r"\w+", text.lower()) if word not in STOPWORDS]
+
+
+def chunk_text(text, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Split text into chunks of `chunk_words` words that overlap by `overlap` words."""
+    words = text.split()
+    if not words:
+        return []
+
+    step = max(chunk_words - overlap, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+def index_path(book_path):
+    return os.path.splitext(book_path)[0] + ".index.json"
+
+
+def embeddings_path(book_path):
+    return os.path.splitext(book_path)[0] + ".embeddings.json"
+
+
+def chunks_digest(chunks):
+    """SHA-256 of the chunk texts, so embeddings can be matched to the index they were built from."""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def build_index(book_path, text=None, with_embeddings=False):
+    """
+    Chunk the book and write its BM25 index (and optional embeddings) to disk.
+    Embeddings from an earlier build are deleted, because their vectors belong
+    to the old chunks.
+    """
+    if text is None:
+        with open(book_path, "r", encoding="utf-8") as f:
+            text = f.read()
+
+    chunks = chunk_text(text)
+
+    # Inverted index: term -> [[chunk_id, term_frequency], ...]
+    postings = {}
+    lengths = []
+    for chunk_id, chunk in enumerate(chunks):
+        terms = tokenize(chunk)
+        lengths.append(len(terms))
+        for term, freq in Counter(terms).items():
+            postings.setdefault(term, []).append([chunk_id, freq])
+
+    index = {
+        "chunk_words": CHUNK_WORDS,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "chunks": chunks,
+        "chunks_digest": chunks_digest(chunks),
+        "lengths": lengths,
+        "avg_length": sum(lengths) / len(lengths) if lengths else 0,
+        "postings": postings,
+    }
+    with open(index_path(book_path), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+    if os.path.exists(embeddings_path(book_path)):
+        os.remove(embeddings_path(book_path))
+    if with_embeddings and chunks:
+        build_embeddings(book_path, chunks)
+
+    return index
+
+
+def build_embeddings(book_path, chunks, batch_size=100):
+    """Embed every chunk with OpenAI and store the vectors next to the book."""
+    vectors = []
+    for start in range(0, len(chunks), batch_size):
+        response = llm_gateway.openai_client().embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=chunks[start:start + batch_size]
+        )
+        vectors.extend(item.embedding for item in response.data)
+
+    with open(embeddings_path(book_path), "w", encoding="utf-8") as f:
+        json.dump({
+            "model": EMBEDDING_MODEL,
+            "chunk_count": len(chunks),
+            "chunks_digest": chunks_digest(chunks),
+            "vectors": vectors,
+        }, f)
+
+
+@lru_cache(maxsize=8)
+def _load_json(path, mtime):
+    # mtime is part of the cache key so a rebuilt index is picked up
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_index(book_path):
+    """Load the book's index, building it first if it does not exist yet."""
+    path = index_path(book_path)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(book_path):
+        build_index(book_path)
+    return _load_json(path, os.path.getmtime(path))
+
+
+def load_embeddings(book_path, index):
+    """Load the book's embeddings, or None if there are none or they were built from other chunks."""
+    path = embeddings_path(book_path)
+    if not os.path.exists(path):
+        return None
+    embeddings = _load_json(path, os.path.getmtime(path))
+    if (embeddings.get("chunk_count") != len(index["chunks"])
+            or embeddings.get("chunks_digest") != index.get("chunks_digest")):
+        return None
+    return embeddings
+
+
+def bm25_search(index, question, top_k):
+    """Return [(chunk_id, score), ...] for the best BM25 matches."""
+    total_chunks = len(index["chunks"])
+    lengths = index["lengths"]
+    avg_length = index["avg_length"] or 1
+    scores = Counter()
+
+    for term in set(tokenize(question)):
+        postings = index["postings"].get(term)
+        if not postings:
+            continue
+        idf = math.log(1 + (total_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+        for chunk_id, freq in postings:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[chunk_id] / avg_length)
+            scores[chunk_id] += idf * freq * (BM25_K1 + 1) / (freq + norm)
+
+    return scores.most_common(top_k)
+
+
+def embedding_search(embeddings, question, top_k):
+    """Return [(chunk_id, similarity), ...] for the closest chunk embeddings."""
+    response = llm_gateway.openai_client().embeddings.create(model=embeddings["model"], input=[question])
+    query = response.data[0].embedding
+    query_norm = math.sqrt(sum(x * x for x in query)) or 1
+
+    similarities = []
+    for chunk_id, vector in enumerate(embeddings["vectors"]):
+        dot = sum(a * b for a, b in zip(query, vector))
+        norm = math.sqrt(sum(x * x for x in vector)) or 1
+        similarities.append((chunk_id, dot / (norm * query_norm)))
+
+    similarities.sort(key=lambda item: item[1], reverse=True)
+    return similarities[:top_k]
+
+
+def search(book_path, question, top_k=5):
+    """Return the `top_k` most relevant chunks of the book for a question."""
+    index = load_index(book_path)
+    if not index["chunks"]:
+        return []
+
+    ranked = bm25_search(index, question, top_k * 2)
+
+    embeddings = load_embeddings(book_path, index)
+    if embeddings is not None:
+        # Reciprocal rank fusion of the two result lists
+        fused = Counter()
+        for results in (ranked, embedding_search(embeddings, question, top_k * 2)):
+            for rank, (chunk_id, _) in enumerate(results):
+                fused[chunk_id] += 1 / (60 + rank)
+        ranked = fused.most_common()
+
+    # Fall back to the start of the book when nothing matches at all
+    chunk_ids = [chunk_id for chunk_id, _ in ranked[:top_k]] or list(range(min(top_k, len(index["chunks"]))))
+    return [index["chunks"][chunk_id] for chunk_id in sorted(chunk_ids)]
+
+
+def build_question_prompt(book_path, question, top_k=5):
+    """Wrap a question with the retrieved passages it should be answered from."""
+    passages = search(book_path, question, top_k)
+    context = "\n\n---\n\n".join(passages)
+    return f"Relevant passages from the book:\n\n{context}\n\nQuestion: {question}"
@@ -0,0 +1,138 @@
+"""
+Shared book store for all Streamlit sessions.
+
+Books are referred to by ID (their name). Each book's text is read from disk
+once per server process with st.cache_resource, keyed by the file's mtime and
+SHA-256, and the same string is shared by every session instead of each
+session keeping its own copy. A small manifest (scanned_books/manifest.json)
+stores each book's size, mtime and hash, so they are only computed once. It is
+kept in step with the directory: .txt files added by hand show up, and deleted
+books are dropped.
+"""
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+
+import streamlit as st
+
+MANIFEST_NAME = "manifest.json"
+
+FULL_BOOK_PROMPT = "You are a helpful assistant that answers questions based on the following book:\n\n"
+
+# Sessions run in threads of the same process, so manifest updates are serialized.
+# Reentrant, because the updates read the manifest through get_manifest().
+_manifest_lock = threading.RLock()
+
+
+def book_path(books_dir, book_id):
+    return os.path.join(books_dir, f"{book_id}.txt")
+
+
+def _file_hash(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _make_entry(path):
+    stat = os.stat(path)
+    return {
+        "file": os.path.basename(path),
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "sha256": _file_hash(path),
+    }
+
+
+@lru_cache(maxsize=4)
+def _read_manifest(path, mtime):
+    # mtime is part of the cache key, so the file is only re-read after it changes
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(books_dir, manifest):
+    path = os.path.join(books_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _book_ids(books_dir):
+    return {name[:-4] for name in os.listdir(books_dir) if name.endswith(".txt")}
+
+
+def _sync_manifest(books_dir):
+    # Drop books whose file is gone and add .txt files the manifest doesn't
+    # list yet; entries of the other books are kept without re-hashing them
+    path = os.path.join(books_dir, MANIFEST_NAME)
+    manifest = _read_manifest(path, os.stat(path).st_mtime_ns) if os.path.exists(path) else {}
+    book_ids = _book_ids(books_dir)
+    synced = {book_id: entry for book_id, entry in manifest.items() if book_id in book_ids}
+    for book_id in sorted(book_ids - set(synced)):
+        synced[book_id] = _make_entry(book_path(books_dir, book_id))
+    if synced != manifest or not os.path.exists(path):
+        _write_manifest(books_dir, synced)
+    return synced
+
+
+def get_manifest(books_dir):
+    """The manifest as {book_id: entry}. Treat it as read-only, it is shared."""
+    path = os.path.join(books_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        manifest = _read_manifest(path, os.stat(path).st_mtime_ns)
+        if set(manifest) == _book_ids(books_dir):
+            return manifest
+    with _manifest_lock:
+        return _sync_manifest(books_dir)
+
+
+def list_books(books_dir):
+    return list(get_manifest(books_dir))
+
+
+def book_exists(books_dir, book_id):
+    return book_id in get_manifest(books_dir)
+
+
+def save_book(books_dir, book_id, text):
+    """Write the book and record it in the manifest. Returns the book's path."""
+    path = book_path(books_dir, book_id)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+    with _manifest_lock:
+        manifest = dict(get_manifest(books_dir))
+        manifest[book_id] = _make_entry(path)
+        _write_manifest(books_dir, manifest)
+    return path
+
+
+def get_entry(books_dir, book_id):
+    """The book's manifest entry, refreshed if the file was changed outside the app."""
+    entry = get_manifest(books_dir)[book_id]
+    path = book_path(books_dir, book_id)
+    if os.path.getmtime(path) != entry["mtime"]:
+        with _manifest_lock:
+            manifest = dict(get_manifest(books_dir))
+            entry = manifest[book_id] = _make_entry(path)
+            _write_manifest(books_dir, manifest)
+    return entry
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _full_book_prompt(path, mtime, sha256):
+    # mtime and sha256 are part of the cache key so an edited book is reloaded
+    with open(path, "r", encoding="utf-8") as f:
+        return FULL_BOOK_PROMPT + f.read()
+
+
+def full_book_prompt(books_dir, book_id):
+    """System prompt containing the whole book, built once and shared by all sessions."""
+    entry = get_entry(books_dir, book_id)
+    return _full_book_prompt(book_path(books_dir, book_id), entry["mtime"], entry["sha256"])
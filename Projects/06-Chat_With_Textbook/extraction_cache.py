@@ -0,0 +1,100 @@
+"""
+Persistent cache of extracted PDF text.
+
+Streamlit reruns the whole script on every widget interaction, so without a
+cache the same uploaded PDF would be extracted (or OCR'd with GPT-4o Vision)
+again and again. Results are stored on disk under the SHA-256 of the uploaded
+bytes and the oldest entries are evicted once the cache grows past its size
+limit.
+"""
+import hashlib
+import os
+from contextlib import contextmanager
+
+import llm_gateway
+
+# Stub OCR text goes to its own folder (.extraction_cache.stub)
+CACHE_DIR = llm_gateway.cache_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".extraction_cache"))
+MAX_CACHE_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", 500 * 1024 * 1024))
+
+
+def file_hash(data):
+    """SHA-256 of the uploaded file's bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_path(digest, method):
+    # `method` keeps results of different extractors (e.g. text-only vs OCR) apart
+    return os.path.join(CACHE_DIR, f"{digest}.{method}.txt")
+
+
+def get(digest, method):
+    """Return the cached text for this file, or None if it has not been seen yet."""
+    path = cache_path(digest, method)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except FileNotFoundError:
+        return None
+
+    # Mark the entry as recently used so it is evicted last
+    os.utime(path)
+    return text
+
+
+def put(digest, method, text):
+    """Store extracted text for this file and evict old entries if needed."""
+    with open_entry(digest, method) as f:
+        f.write(text)
+
+
+@contextmanager
+def open_entry(digest, method):
+    """
+    Open a new cache entry for writing, so extractors can stream pages into it.
+
+    The entry only becomes visible once the block finishes without an error.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_path(digest, method)
+
+    # Write to a temporary file first so a crash never leaves half an entry behind
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            yield f
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+    evict()
+
+
+def discard(digest, method):
+    """Remove an entry, e.g. when its extraction only partly succeeded."""
+    try:
+        os.remove(cache_path(digest, method))
+    except FileNotFoundError:
+        pass
+
+
+def evict(max_bytes=MAX_CACHE_BYTES):
+    """Delete least recently used entries until the cache fits in `max_bytes`."""
+    if not os.path.isdir(CACHE_DIR):
+        return
+
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".txt"):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
@@ -0,0 +1,117 @@
+"""
+Token-budgeted chat history.
+
+Every message is kept for display, but only the recent part of the
+conversation is sent to the model. Once the conversation grows past its token
+budget, the oldest turns are folded into a rolling summary (written by a small,
+cheap model) and the last few messages are kept word for word. Each turn then
+costs about the same, however long the study session gets.
+
+The system prompt (which may contain a whole book) is not stored here. It is
+passed in for each request from the shared book store.
+"""
+import hashlib
+import os
+
+import llm_gateway
+import token_counter
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 4000))
+
+# Messages (user + assistant) that are always sent verbatim
+KEEP_RECENT_MESSAGES = 6
+
+SUMMARY_MODEL = "gpt-4o-mini"
+
+
+def summarize_messages(previous_summary, messages):
+    """Fold `messages` into the running summary of the conversation."""
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    prompt = (
+        "Update the summary of a conversation between a student and an assistant about a book. "
+        "Keep the questions asked, the key facts in the answers and anything the student said about themselves. "
+        "Be concise.\n\n"
+        f"Current summary:\n{previous_summary or '(none yet)'}\n\n"
+        f"New messages:\n{transcript}"
+    )
+    response = llm_gateway.openai_client().chat.completions.create(
+        model=SUMMARY_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0
+    )
+    return response.choices[0].message.content
+
+
+class ChatHistory:
+    """A conversation whose request size stays within a token budget."""
+
+    def __init__(self, system_tokens=0, budget=HISTORY_TOKEN_BUDGET, keep_recent=KEEP_RECENT_MESSAGES):
+        self.system_tokens = system_tokens
+        self.budget = budget
+        self.keep_recent = keep_recent
+
+        # All user/assistant messages, for display
+        self.messages = []
+        self.token_counts = []
+
+        # messages[:folded] are only sent as part of the summary
+        self.folded = 0
+        self.summary = ""
+        self.summary_tokens = 0
+
+        # Tokens of the summary plus the unfolded messages, kept up to date on every change
+        self.history_tokens = 0
+
+    @property
+    def total_tokens(self):
+        return self.system_tokens + self.history_tokens
+
+    def add(self, role, content):
+        message = {"role": role, "content": content}
+        tokens = token_counter.count_message_tokens(message)
+        self.messages.append(message)
+        self.token_counts.append(tokens)
+        self.history_tokens += tokens
+
+    def compact(self, summarize=summarize_messages):
+        """If over budget, fold all but the recent messages into the summary. Returns True if it did."""
+        if self.history_tokens <= self.budget:
+            return False
+
+        # Cut so the verbatim part starts with a user message
+        cut = len(self.messages) - self.keep_recent
+        while cut > self.folded and self.messages[cut]["role"] != "user":
+            cut -= 1
+        if cut <= self.folded:
+            return False
+
+        summary = summarize(self.summary, self.messages[self.folded:cut])
+        summary_tokens = token_counter.count_message_tokens({"content": summary})
+
+        self.history_tokens -= sum(self.token_counts[self.folded:cut]) + self.summary_tokens
+        self.history_tokens += summary_tokens
+        self.summary = summary
+        self.summary_tokens = summary_tokens
+        self.folded = cut
+        return True
+
+    def context_key(self):
+        """Short hash of the conversation before the latest message, e.g. for caching answers."""
+        earlier = [self.summary] + [f"{m['role']}: {m['content']}" for m in self.messages[self.folded:-1]]
+        return hashlib.sha256("\n".join(earlier).encode("utf-8")).hexdigest()[:16]
+
+    def request_messages(self, system_prompt, last_user_content=None):
+        """
+        Messages to send to the model: system prompt, summary and recent turns.
+
+        `last_user_content` replaces the latest user message for this request
+        only, e.g. to attach retrieved passages without storing them.
+        """
+        messages = [{"role": "system", "content": system_prompt}]
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+
+        recent = self.messages[self.folded:]
+        if last_user_content is not None:
+            recent = recent[:-1] + [{"role": "user", "content": last_user_content}]
+        return messages + recent
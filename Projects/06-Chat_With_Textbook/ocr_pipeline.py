@@ -0,0 +1,256 @@
+"""
+Pipelined GPT-4o Vision OCR for scanned books.
+
+The work runs in three overlapping stages:
+1. Pages are rasterized lazily, a few at a time (pdf2image first_page/last_page).
+2. Each image is resized and PNG/base64 encoded on a thread pool.
+3. Vision requests run with a limited number in flight; the shared provider
+   gateway rate limits them and retries with backoff.
+
+Results are handed back in page order as they complete. Only a bounded number
+of pages is ever held in memory, however long the book is.
+
+Routing is done per page: pages with enough embedded text keep their PyPDF2
+text, and only the rest are OCR'd. Blank pages (no more ink than a few specks
+of scanner dust) are skipped, and repeated pages (byte-identical rasters,
+found by their digest) reuse the text of the first copy instead of making
+another request. Text pages are streamed too, and only wait while an earlier
+page is still being OCR'd.
+"""
+import base64
+import hashlib
+import io
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image
+
+import llm_gateway
+import pdf_extraction
+
+OCR_MODEL = "gpt-4o"
+OCR_PROMPT = "Extract all readable text from this image."
+OCR_DPI = 100
+MAX_IMAGE_SIZE = (1024, 1024)
+
+# Pages rasterized per pdf2image call
+BATCH_SIZE = 4
+
+# A page needs at least this many characters of embedded text to skip OCR
+MIN_TEXT_CHARS = 50
+
+# A pixel is ink if it is this much darker than the page background (0-255)
+INK_CONTRAST = 80
+# Pages with fewer ink pixels than this at OCR_DPI count as blank; a single
+# short line of text, like "Chapter 3: Plants", has about 500
+MIN_INK_PIXELS = 100
+
+def encode_image(image):
+    """Shrink a page image and return it as a base64 PNG string."""
+    image.thumbnail(MAX_IMAGE_SIZE, Image.Resampling.LANCZOS)
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+
+def extract_text_with_gpt4o(image_base64):
+    """Send one encoded page to GPT-4o Vision; rate limits and temporary errors are retried by the gateway."""
+    try:
+        response = llm_gateway.openai_client().chat.completions.create(
+            model=OCR_MODEL,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_base64}"}},
+                        {"type": "text", "text": OCR_PROMPT}
+                    ]
+                }
+            ],
+            max_tokens=1000
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        return f"[Error] {str(e)}"
+
+
+def is_blank(image):
+    """
+    True if the page has (almost) no ink. Counted on the full-resolution image,
+    because shrinking it first averages a lone title or equation away.
+    """
+    histogram = image.convert("L").histogram()
+    background = max(range(256), key=histogram.__getitem__)
+    ink_pixels = sum(histogram[:max(0, background - INK_CONTRAST)])
+    return ink_pixels < MIN_INK_PIXELS
+
+
+def page_digest(image):
+    """
+    Digest of the full-resolution raster. Only byte-identical pages match:
+    small hashes can't tell pages of dense text apart, and reusing another
+    page's OCR text would silently lose content.
+    """
+    digest = hashlib.sha256(f"{image.mode}{image.size}".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.digest()
+
+
+def _ocr_when_encoded(encoded_future):
+    return extract_text_with_gpt4o(encoded_future.result())
+
+
+def iter_ocr_pages(pdf_path, page_numbers=None, concurrency=4, progress_callback=None, stats=None):
+    """
+    OCR pages of a PDF and yield (page_number, text) in page order.
+
+    `page_numbers` (1-based, ascending) defaults to every page.
+    `concurrency` is the number of Vision requests in flight at once.
+    `progress_callback(pages_done, total_pages)` is called after each page.
+    If a `stats` dict is given, it is filled with "ocr", "blank" and "duplicate" page counts.
+    """
+    if page_numbers is None:
+        page_numbers = range(1, pdfinfo_from_path(pdf_path)["Pages"] + 1)
+    for page in _ocr_pipeline(pdf_path, page_numbers, concurrency, progress_callback, stats):
+        if page is not None:
+            yield page
+
+
+def _ocr_pipeline(pdf_path, page_numbers, concurrency, progress_callback, stats):
+    # `page_numbers` may be a lazy iterator, and it may produce None between
+    # pages. Each None is answered by yielding the pages finished so far and
+    # then None, so the caller can go on with its own work while requests run.
+    total_pages = len(page_numbers) if hasattr(page_numbers, "__len__") else 0
+    if stats is None:
+        stats = {}
+    stats.update(ocr=0, blank=0, duplicate=0)
+
+    # Never hold more than this many rasterized/pending pages at once
+    max_in_flight = max(concurrency * 2, BATCH_SIZE)
+
+    # page_number -> text (blank pages) or a future with the OCR text
+    pending = {}
+    # digest -> OCR future of every page sent to OCR, for duplicates to share
+    ocr_futures = {}
+    pages_done = 0
+
+    with ThreadPoolExecutor(max_workers=2) as encode_pool, \
+            ThreadPoolExecutor(max_workers=concurrency) as request_pool:
+
+        def finished_pages():
+            # Yield pages from the front of the queue, in order, once they are done
+            nonlocal pages_done
+            while pending:
+                first_page = min(pending)
+                result = pending[first_page]
+                if isinstance(result, str):
+                    text = result
+                elif result.done():
+                    text = result.result()
+                else:
+                    break
+                del pending[first_page]
+                pages_done += 1
+                if progress_callback:
+                    progress_callback(pages_done, max(total_pages, pages_done))
+                yield first_page, text
+
+        def start_batch(batch):
+            # Wait for earlier pages before rasterizing more, to keep memory bounded
+            while len(pending) + len(batch) > max_in_flight:
+                result = pending[min(pending)]
+                if not isinstance(result, str):
+                    result.exception()  # blocks until the request is done
+                yield from finished_pages()
+
+            images = convert_from_path(pdf_path, dpi=OCR_DPI, first_page=batch[0], last_page=batch[-1])
+            for page_number, image in zip(batch, images):
+                if is_blank(image):
+                    stats["blank"] += 1
+                    pending[page_number] = ""
+                    continue
+
+                digest = page_digest(image)
+                if digest in ocr_futures:
+                    # Same page as one already sent to OCR: share its request
+                    stats["duplicate"] += 1
+                    pending[page_number] = ocr_futures[digest]
+                    continue
+
+                stats["ocr"] += 1
+                encoded = encode_pool.submit(encode_image, image)
+                ocr_futures[digest] = request_pool.submit(_ocr_when_encoded, encoded)
+                pending[page_number] = ocr_futures[digest]
+            del images
+
+            yield from finished_pages()
+
+        # Runs of consecutive pages, at most BATCH_SIZE long, so each
+        # pdf2image call only renders pages we actually need
+        batch = []
+        for page_number in page_numbers:
+            if page_number is None:
+                if batch:
+                    yield from start_batch(batch)
+                    batch = []
+                yield from finished_pages()
+                yield None
+                continue
+            if not hasattr(page_numbers, "__len__"):
+                total_pages += 1
+            if batch and (page_number != batch[-1] + 1 or len(batch) == BATCH_SIZE):
+                yield from start_batch(batch)
+                batch = []
+            batch.append(page_number)
+        if batch:
+            yield from start_batch(batch)
+
+        # Wait for the remaining pages in order
+        while pending:
+            result = pending[min(pending)]
+            if not isinstance(result, str):
+                result.exception()
+            yield from finished_pages()
+
+
+def iter_hybrid_pages(pdf_path, concurrency=4, text_progress=None, ocr_progress=None, stats=None):
+    """
+    Yield (page_number, text, source) for every page, in order.
+
+    Pages with at least MIN_TEXT_CHARS of embedded text use it directly
+    (source "text"); all other pages go through the OCR pipeline (source "ocr").
+    Both are streamed: a text page is only held back while an earlier page
+    is still being OCR'd.
+    """
+    if stats is None:
+        stats = {}
+    stats["text"] = 0
+
+    # Pages read but not yielded yet, in order: (page_number, text), with
+    # text None for pages waiting for OCR
+    held = deque()
+    ocr_texts = {}
+
+    def ocr_page_numbers():
+        # Feeds the OCR pipeline while reading the embedded text; text pages
+        # become None ticks, so the pipeline hands back control after each one
+        page_texts = pdf_extraction.iter_page_texts(pdf_path, progress_callback=text_progress)
+        for page_number, text in enumerate(page_texts, start=1):
+            if len(text.strip()) < MIN_TEXT_CHARS:
+                held.append((page_number, None))
+                yield page_number
+            else:
+                stats["text"] += 1
+                held.append((page_number, text))
+                yield None
+
+    for page in _ocr_pipeline(pdf_path, ocr_page_numbers(), concurrency, ocr_progress, stats):
+        if page is not None:
+            ocr_texts[page[0]] = page[1]
+        while held and (held[0][1] is not None or held[0][0] in ocr_texts):
+            page_number, text = held.popleft()
+            if text is None:
+                yield page_number, ocr_texts.pop(page_number), "ocr"
+            else:
+                yield page_number, text, "text"
@@ -0,0 +1,91 @@
+"""
+Parallel page extraction for text-based PDFs.
+
+Page ranges are split across a process pool (PyPDF2 is pure Python, so threads
+would not help) and the page texts are yielded back in order as soon as each
+range finishes. Writing them straight to a file keeps memory flat and avoids
+building the book with repeated string concatenation.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from PyPDF2 import PdfReader
+
+# Pages handed to a worker at a time; small enough for smooth progress updates
+PAGES_PER_TASK = 16
+
+# Below this many pages, starting worker processes costs more than it saves
+MIN_PAGES_FOR_POOL = 32
+
+
+# Each worker process keeps one reader open, because loading the page tree
+# touches every page and would otherwise be repeated for every range
+_readers = {}
+
+
+def _get_reader(pdf_path):
+    if pdf_path not in _readers:
+        _readers.clear()
+        _readers[pdf_path] = PdfReader(pdf_path)
+    return _readers[pdf_path]
+
+
+def _extract_range(pdf_path, start, end):
+    reader = _get_reader(pdf_path)
+    texts = []
+    for page_index in range(start, end):
+        try:
+            texts.append(reader.pages[page_index].extract_text() or "")
+        except Exception:
+            # One broken page shouldn't lose the whole book
+            texts.append("")
+    return texts
+
+
+def iter_page_texts(pdf_path, workers=None, progress_callback=None):
+    """
+    Yield the text of every page in order.
+
+    `progress_callback(pages_done, total_pages)` is called after each page.
+    `workers` defaults to the number of CPUs; use 1 to extract in this process.
+    """
+    # Drop any reader left over from an earlier run, the file may have been replaced
+    _readers.clear()
+    total_pages = len(_get_reader(pdf_path).pages)
+    workers = workers or os.cpu_count() or 1
+    starts = list(range(0, total_pages, PAGES_PER_TASK))
+    ends = [min(start + PAGES_PER_TASK, total_pages) for start in starts]
+
+    try:
+        if workers == 1 or total_pages < MIN_PAGES_FOR_POOL:
+            results = map(_extract_range, repeat(pdf_path), starts, ends)
+            yield from _with_progress(results, total_pages, progress_callback)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # map() returns results in submission order while ranges run in parallel
+                results = pool.map(_extract_range, repeat(pdf_path), starts, ends)
+                yield from _with_progress(results, total_pages, progress_callback)
+    finally:
+        _readers.clear()
+
+
+def _with_progress(range_results, total_pages, progress_callback):
+    pages_done = 0
+    for texts in range_results:
+        for text in texts:
+            pages_done += 1
+            if progress_callback:
+                progress_callback(pages_done, total_pages)
+            yield text
+
+
+def write_pages(pdf_path, out_file, workers=None, progress_callback=None):
+    """Stream every non-empty page into an open text file. Returns the number of pages written."""
+    pages_written = 0
+    for text in iter_page_texts(pdf_path, workers, progress_callback):
+        if text:
+            out_file.write(text)
+            out_file.write("\n")
+            pages_written += 1
+    return pages_written
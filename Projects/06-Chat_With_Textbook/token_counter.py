@@ -0,0 +1,63 @@
+"""
+Token accounting for books and chat history.
+
+- The tiktoken encoder is loaded once per process instead of on every call.
+- A book's token count is stored next to it (<book>.meta.json) when it is
+  saved, so large books are not re-encoded on every Streamlit rerun.
+- Each chat message is counted once, when it is added, so the running
+  conversation total is just a sum that is updated per turn.
+"""
+import json
+import os
+from functools import lru_cache
+
+import tiktoken
+
+DEFAULT_MODEL = "gpt-4o"
+
+# Extra tokens the chat format adds around every message (role, separators)
+MESSAGE_OVERHEAD = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model=DEFAULT_MODEL):
+    return tiktoken.encoding_for_model(model)
+
+
+def count_tokens(text, model=DEFAULT_MODEL):
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+
+def count_message_tokens(message, model=DEFAULT_MODEL):
+    return MESSAGE_OVERHEAD + count_tokens(message["content"], model)
+
+
+def meta_path(book_path):
+    return os.path.splitext(book_path)[0] + ".meta.json"
+
+
+def save_book_meta(book_path, text, model=DEFAULT_MODEL):
+    """Count the book's tokens once and store them next to the book."""
+    meta = {
+        "characters": len(text),
+        "tokens": count_tokens(text, model),
+        "model": model,
+        "mtime": os.path.getmtime(book_path),
+    }
+    with open(meta_path(book_path), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def get_book_meta(book_path, model=DEFAULT_MODEL):
+    """Return the stored metadata, recounting only if the book changed since it was saved."""
+    try:
+        with open(meta_path(book_path), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["mtime"] == os.path.getmtime(book_path) and meta["model"] == model:
+            return meta
+    except (FileNotFoundError, KeyError, ValueError):
+        pass
+
+    with open(book_path, "r", encoding="utf-8") as f:
+        return save_book_meta(book_path, f.read(), model)
@@ -0,0 +1,76 @@
+"""
+One place where all projects get their AI provider clients.
+
+Every project used to configure OpenAI, Gemini, ElevenLabs and Hugging Face
+its own way, without connection pooling, with different (or no) retries and
+without any rate limiting. The gateway hands out clients that all share:
+
+- pooled keep-alive HTTP connections, one pool per provider and process
+- a token bucket per provider, so all sessions, threads and tasks together
+  stay within the provider's requests per minute
+- retries with exponential backoff and jitter for rate limits, server errors
+  and network errors, waiting as long as the server asks in Retry-After
+- a local stub backend (LLM_GATEWAY_BACKEND=stub) that answers every request
+  without network access or API keys, for demos, tests and load tests
+
+open_answer_cache() gives the projects a shared local cache of answers to
+repeated questions, and cache_path() keeps the stub backend's cached answers
+apart from the live ones.
+
+The clients are the providers' own SDK clients, so the projects keep using
+the APIs they know:
+
+    import llm_gateway
+
+    client = llm_gateway.openai_client()
+    client.chat.completions.create(model="gpt-4o-mini", messages=[...])
+
+    model = llm_gateway.gemini_model("gemini-1.5-flash")
+    model.generate_content("Tell me a fun fact")
+
+Async code uses async_openai_client(), async_elevenlabs_client(),
+async_http_client() and the models' generate_content_async().
+"""
+from .answer_cache import AnswerCache, open_answer_cache
+from .backend import cache_path, current_backend, use_backend
+from .clients import (
+    async_elevenlabs_client,
+    async_http_client,
+    async_openai_client,
+    elevenlabs_client,
+    http_client,
+    openai_client,
+)
+from .limits import TokenBucket, rate_limiter, set_rate_limit
+from .retry import backoff_delay, call_with_retries, call_with_retries_async
+
+__all__ = [
+    "AnswerCache",
+    "GatewayModel",
+    "TokenBucket",
+    "async_elevenlabs_client",
+    "async_http_client",
+    "async_openai_client",
+    "backoff_delay",
+    "cache_path",
+    "call_with_retries",
+    "call_with_retries_async",
+    "current_backend",
+    "elevenlabs_client",
+    "gemini_model",
+    "http_client",
+    "open_answer_cache",
+    "openai_client",
+    "rate_limiter",
+    "set_rate_limit",
+    "use_backend",
+]
+
+
+def __getattr__(name):
+    # Gemini support needs google-generativeai, which the OpenAI-only projects
+    # don't install, so it is only imported when it is used
+    if name in ("GatewayModel", "gemini_model"):
+        from . import gemini
+        return getattr(gemini, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
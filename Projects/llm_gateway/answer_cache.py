@@ -0,0 +1,147 @@
+"""
+Local cache of answers to repeated questions.
+
+Answers are stored in a small SQLite file under a namespace (for example a
+book and conversation, or a subject) plus the normalized question. A lookup
+finds the same question again even if it is written with different case,
+spacing or punctuation; numbers and math operators are part of the question,
+so "What is 2+2?" and "What is 2*2?" stay different. Matching reworded
+questions by character trigram similarity can be turned on with
+ANSWER_CACHE_SIMILARITY below 1, but a fuzzy match never joins questions with
+different numbers or operators ("chapter 3" vs "chapter 4"). Entries expire
+after a TTL and the least recently used ones are dropped when the cache is full.
+"""
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from .backend import cache_path
+
+TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 5000))
+
+# Similarity (0-1) a cached question needs to count as the same question; 1 (the default) means exact matches only
+SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY", 1.0))
+
+# How many recent questions per namespace are compared for a fuzzy match
+MAX_CANDIDATES = 500
+
+# Numbers (with decimals) and math operators are kept as separate tokens
+_TOKEN = re.compile(r"\d+(?:[.,]\d+)*|[^\W\d_]+|[+\-*/×÷=<>^%()]")
+
+
+def normalize(question):
+    """Lowercase and drop punctuation and extra spaces, keeping numbers and math operators."""
+    question = question.lower().replace("what's", "what is").replace("'", "")
+    return " ".join(_TOKEN.findall(question))
+
+
+def _exact_tokens(key):
+    # The parts of a question a fuzzy match must not change
+    return [token for token in key.split() if not token.isalpha()]
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a, b):
+    """Cosine similarity of two normalized questions' character trigrams."""
+    grams_a, grams_b = _trigrams(a), _trigrams(b)
+    dot = sum(count * grams_b[gram] for gram, count in grams_a.items())
+    norm = math.sqrt(sum(c * c for c in grams_a.values())) * math.sqrt(sum(c * c for c in grams_b.values()))
+    return dot / norm if norm else 0.0
+
+
+class AnswerCache:
+    """Answers stored in the SQLite file at `path`, shared by all sessions of the process."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _db(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " namespace TEXT, question TEXT, answer TEXT, created REAL, last_used REAL,"
+                " PRIMARY KEY (namespace, question))"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+        return self._connection
+
+    def get(self, namespace, question, threshold=SIMILARITY_THRESHOLD):
+        """Return a cached answer for this question, or None."""
+        key = normalize(question)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT question, answer FROM answers WHERE namespace = ? AND question = ? AND created > ?",
+                (namespace, key, now - TTL_SECONDS)
+            ).fetchone()
+
+            if row is None and threshold < 1:
+                candidates = db.execute(
+                    "SELECT question, answer FROM answers WHERE namespace = ? AND created > ?"
+                    " ORDER BY last_used DESC LIMIT ?",
+                    (namespace, now - TTL_SECONDS, MAX_CANDIDATES)
+                ).fetchall()
+                exact_tokens = _exact_tokens(key)
+                scored = [
+                    (similarity(key, cached), cached, answer) for cached, answer in candidates
+                    if _exact_tokens(cached) == exact_tokens
+                ]
+                best = max(scored, default=None)
+                if best is not None and best[0] >= threshold:
+                    row = best[1:]
+
+            if row is None:
+                return None
+
+            db.execute(
+                "UPDATE answers SET last_used = ? WHERE namespace = ? AND question = ?",
+                (now, namespace, row[0])
+            )
+            db.commit()
+            return row[1]
+
+    def put(self, namespace, question, answer):
+        """Store an answer, then drop expired and least recently used entries."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+                (namespace, normalize(question), answer, now, now)
+            )
+            db.execute("DELETE FROM answers WHERE created <= ?", (now - TTL_SECONDS,))
+            db.execute(
+                "DELETE FROM answers WHERE rowid IN ("
+                " SELECT rowid FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (MAX_ENTRIES,)
+            )
+            db.commit()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def open_answer_cache(path):
+    """
+    The AnswerCache stored at `path` (a separate file for the stub backend);
+    the same object every time in a process.
+    """
+    path = os.path.abspath(cache_path(path))
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = AnswerCache(path)
+        return _caches[path]
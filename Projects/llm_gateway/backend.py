@@ -0,0 +1,42 @@
+"""
+Which backend answers the gateway's requests: the real providers ("live") or
+the local stub ("stub"). Set LLM_GATEWAY_BACKEND, or call use_backend() before
+creating any clients (e.g. at the top of a load test).
+
+Projects keep their local caches (answers, recommendations, voices, audio)
+under cache_path(), so stub answers are never served to live users.
+"""
+import os
+
+BACKENDS = ("live", "stub")
+
+_backend = os.getenv("LLM_GATEWAY_BACKEND", "live")
+if _backend not in BACKENDS:
+    raise ValueError(f"LLM_GATEWAY_BACKEND must be one of {BACKENDS}, not {_backend!r}")
+
+# Called when the backend changes, so cached clients are created again
+_reset_hooks = []
+
+
+def current_backend():
+    return _backend
+
+
+def cache_path(path):
+    """
+    Where a local cache file or folder lives for the current backend: `path`
+    itself for live, and e.g. `.answer_cache.stub.sqlite3` for the stub.
+    """
+    if _backend == "live":
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{_backend}{ext}"
+
+
+def use_backend(name):
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}, choose one of {BACKENDS}")
+    _backend = name
+    for hook in _reset_hooks:
+        hook()
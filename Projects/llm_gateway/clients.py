@@ -0,0 +1,134 @@
+"""
+Shared, pooled clients for the HTTP-based providers.
+
+Each function returns the same client every time it is called in a process,
+so all sessions reuse its keep-alive connections. Async clients are meant to
+be used from one event loop (the web server's, or the one asyncio.run()
+starts in a script).
+
+httpx and the provider SDKs are only imported when their client is first
+needed, so projects that only use Gemini don't need them installed.
+"""
+import os
+import socket
+import threading
+
+from . import backend
+
+# Connections per provider: open at once, and kept alive between requests
+MAX_CONNECTIONS = int(os.getenv("LLM_GATEWAY_MAX_CONNECTIONS", 100))
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+TIMEOUT_SECONDS = 120
+
+# Requests are sent as headers and body separately; without TCP_NODELAY the
+# body can wait for the server's delayed ACK (about 40 ms per request)
+SOCKET_OPTIONS = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+CONNECT_TIMEOUT_SECONDS = 10
+
+_clients = {}
+# Reentrant, because making an SDK client first makes its shared HTTP client
+_lock = threading.RLock()
+
+
+def _reset():
+    # Clients made for the previous backend must not be reused
+    with _lock:
+        _clients.clear()
+
+
+backend._reset_hooks.append(_reset)
+
+
+def _cached(name, factory):
+    with _lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def _transport(provider, is_async):
+    import httpx
+
+    from . import stub
+    from .transport import AsyncGatewayTransport, GatewayTransport
+
+    if backend.current_backend() == "stub":
+        inner = stub.StubTransport()
+    else:
+        limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS)
+        transport_class = httpx.AsyncHTTPTransport if is_async else httpx.HTTPTransport
+        inner = transport_class(limits=limits, socket_options=SOCKET_OPTIONS)
+    return AsyncGatewayTransport(provider, inner) if is_async else GatewayTransport(provider, inner)
+
+
+def _timeout():
+    import httpx
+
+    return httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS)
+
+
+def http_client(provider="web"):
+    """
+    A pooled httpx.Client for calling `provider` directly (e.g. "huggingface").
+    Providers without a rate limit, like the default "web", still get pooling and retries.
+    """
+    import httpx
+
+    return _cached(
+        ("http", provider),
+        lambda: httpx.Client(transport=_transport(provider, False), timeout=_timeout(), follow_redirects=True)
+    )
+
+
+def async_http_client(provider="web"):
+    import httpx
+
+    return _cached(
+        ("async_http", provider),
+        lambda: httpx.AsyncClient(transport=_transport(provider, True), timeout=_timeout(), follow_redirects=True)
+    )
+
+
+def _api_key(name):
+    # The stub accepts any key, so it runs without a .env file
+    return os.getenv(name) or ("stub" if backend.current_backend() == "stub" else None)
+
+
+def openai_client():
+    """The shared OpenAI client. The gateway does the retrying, so the SDK's own retries are off."""
+    from openai import OpenAI
+
+    return _cached("openai", lambda: OpenAI(
+        api_key=_api_key("OPENAI_API_KEY"),
+        http_client=http_client("openai"),
+        max_retries=0
+    ))
+
+
+def async_openai_client():
+    from openai import AsyncOpenAI
+
+    return _cached("async_openai", lambda: AsyncOpenAI(
+        api_key=_api_key("OPENAI_API_KEY"),
+        http_client=async_http_client("openai"),
+        max_retries=0
+    ))
+
+
+def elevenlabs_client():
+    from elevenlabs import ElevenLabs
+
+    return _cached("elevenlabs", lambda: ElevenLabs(
+        api_key=_api_key("ELEVENLABS_API_KEY"),
+        httpx_client=http_client("elevenlabs")
+    ))
+
+
+def async_elevenlabs_client():
+    from elevenlabs import AsyncElevenLabs
+
+    return _cached("async_elevenlabs", lambda: AsyncElevenLabs(
+        api_key=_api_key("ELEVENLABS_API_KEY"),
+        httpx_client=async_http_client("elevenlabs")
+    ))
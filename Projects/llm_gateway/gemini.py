@@ -0,0 +1,89 @@
+"""
+Gemini models behind the gateway's rate limit and retries.
+
+google-generativeai talks to Gemini over its own gRPC channel (one per
+process, already shared), so it can't use the gateway's HTTP transport.
+Instead gemini_model() returns a GenerativeModel subclass whose calls wait
+for the "gemini" token bucket and are retried with backoff. Chat sessions
+from start_chat() send through the same methods, so they are covered too.
+"""
+import os
+import threading
+
+import google.generativeai as genai
+from google.api_core import exceptions
+
+from . import backend, stub
+from .limits import rate_limiter
+from .retry import call_with_retries, call_with_retries_async
+
+# Rate limits and temporary server problems
+RETRYABLE_ERRORS = (
+    exceptions.TooManyRequests,
+    exceptions.ResourceExhausted,
+    exceptions.InternalServerError,
+    exceptions.ServiceUnavailable,
+    exceptions.DeadlineExceeded,
+)
+
+_configured = False
+_lock = threading.Lock()
+
+
+def configure():
+    """Configure the Gemini API key once per process."""
+    global _configured
+    with _lock:
+        if not _configured:
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            _configured = True
+
+
+def _wait_for_turn():
+    bucket = rate_limiter("gemini")
+    if bucket:
+        bucket.acquire()
+
+
+async def _wait_for_turn_async():
+    bucket = rate_limiter("gemini")
+    if bucket:
+        await bucket.acquire_async()
+
+
+class GatewayModel(genai.GenerativeModel):
+    """A GenerativeModel whose requests are rate limited, retried, and answered by the stub if selected."""
+
+    def generate_content(self, *args, **kwargs):
+        def request():
+            _wait_for_turn()
+            if backend.current_backend() == "stub":
+                return stub.gemini_response(self, *args, **kwargs)
+            return super(GatewayModel, self).generate_content(*args, **kwargs)
+        return call_with_retries(request, RETRYABLE_ERRORS, "gemini")
+
+    async def generate_content_async(self, *args, **kwargs):
+        async def request():
+            await _wait_for_turn_async()
+            if backend.current_backend() == "stub":
+                return await stub.gemini_response_async(self, *args, **kwargs)
+            return await super(GatewayModel, self).generate_content_async(*args, **kwargs)
+        return await call_with_retries_async(request, RETRYABLE_ERRORS, "gemini")
+
+    def count_tokens(self, *args, **kwargs):
+        def request():
+            _wait_for_turn()
+            if backend.current_backend() == "stub":
+                return stub.gemini_count_tokens(*args, **kwargs)
+            return super(GatewayModel, self).count_tokens(*args, **kwargs)
+        return call_with_retries(request, RETRYABLE_ERRORS, "gemini")
+
+
+def gemini_model(model_name, **kwargs):
+    """
+    A Gemini model, e.g. gemini_model("gemini-1.5-flash", system_instruction="...").
+    Takes the same arguments as genai.GenerativeModel. Models with cached
+    content are made with GatewayModel.from_cached_content().
+    """
+    configure()
+    return GatewayModel(model_name, **kwargs)
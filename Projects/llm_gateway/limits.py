@@ -0,0 +1,88 @@
+"""
+Per-provider rate limits.
+
+Every provider has one token bucket per process, shared by all of its clients,
+so every session, thread and task together stays within the provider's quota.
+Requests wait for a token instead of being rejected with 429 errors.
+
+The defaults are conservative; set e.g. LLM_GATEWAY_OPENAI_RPM=3000 to match
+your plan, or 0 for no limit. Scripts can also call set_rate_limit().
+"""
+import asyncio
+import os
+import threading
+import time
+
+# Requests per minute for each provider
+DEFAULT_RATE_LIMITS = {
+    "openai": 500,
+    "gemini": 60,
+    "elevenlabs": 100,
+    "huggingface": 60,
+}
+
+# Requests that may be sent at once after a quiet period
+DEFAULT_BURST = 10
+
+
+class TokenBucket:
+    """
+    Allows `rate_per_minute` calls per minute on average, with bursts of up to
+    `burst` calls. acquire() blocks until a call is allowed and acquire_async()
+    waits without blocking the event loop; both are thread-safe.
+    """
+
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _take(self):
+        # Take a token if there is one; otherwise return how long until there is
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+_buckets = {}
+_lock = threading.Lock()
+
+
+def _default_bucket(provider):
+    rate = float(os.getenv(f"LLM_GATEWAY_{provider.upper()}_RPM", DEFAULT_RATE_LIMITS.get(provider, 0)))
+    return TokenBucket(rate, burst=DEFAULT_BURST) if rate > 0 else None
+
+
+def rate_limiter(provider):
+    """The provider's shared TokenBucket, or None if it isn't rate limited."""
+    with _lock:
+        if provider not in _buckets:
+            _buckets[provider] = _default_bucket(provider)
+        return _buckets[provider]
+
+
+def set_rate_limit(provider, rate_per_minute, burst=DEFAULT_BURST):
+    """Change a provider's limit for this process; None or 0 removes it."""
+    with _lock:
+        _buckets[provider] = TokenBucket(rate_per_minute, burst) if rate_per_minute else None
@@ -0,0 +1,87 @@
+"""
+Retries with exponential backoff.
+
+Rate limits (429), server errors (5xx) and network errors are retried; other
+errors, like a bad request or a wrong API key, are raised straight away.
+Between attempts the gateway waits as long as the server asks for (the
+Retry-After header, or Hugging Face's estimated loading time), otherwise a
+random time up to an exponentially growing limit ("full jitter"), so parallel
+requests don't all retry at the same moment.
+"""
+import asyncio
+import email.utils
+import json
+import math
+import os
+import random
+import time
+
+MAX_RETRIES = int(os.getenv("LLM_GATEWAY_MAX_RETRIES", 4))
+BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30
+
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt):
+    """Seconds to wait before retry number `attempt` (0-based), with full jitter."""
+    return random.uniform(0, min(BACKOFF_SECONDS * 2 ** attempt, MAX_BACKOFF_SECONDS))
+
+
+def _clamp(seconds):
+    # Negative, infinite or NaN delays from a misbehaving server are ignored
+    if not math.isfinite(seconds) or seconds < 0:
+        return None
+    return min(seconds, MAX_BACKOFF_SECONDS)
+
+
+def server_delay(headers, body=b""):
+    """
+    The delay the server asked for, in seconds, or None. A value that can't
+    be parsed also gives None, so the normal backoff applies.
+    """
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        try:
+            return _clamp(float(retry_after))
+        except ValueError:
+            pass
+        try:
+            # Retry-After can also be an HTTP date
+            retry_at = email.utils.parsedate_to_datetime(retry_after).timestamp()
+            return _clamp(max(retry_at - time.time(), 0))
+        except (ValueError, TypeError):
+            return None
+
+    # A loading Hugging Face model answers 503 with {"estimated_time": seconds}
+    try:
+        estimated_time = _clamp(float(json.loads(body)["estimated_time"]))
+    except (ValueError, TypeError, KeyError, IndexError):
+        return None
+    return estimated_time or None
+
+
+def call_with_retries(function, retryable, name="request"):
+    """Call `function()`, retrying it when it raises one of the `retryable` exceptions."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return function()
+        except retryable as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"{name} attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+async def call_with_retries_async(function, retryable, name="request"):
+    """Like call_with_retries() for an async `function`; waits without blocking the event loop."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return await function()
+        except retryable as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"{name} attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
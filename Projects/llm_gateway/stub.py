@@ -0,0 +1,245 @@
+"""
+Local stub backend: answers every provider request without network access.
+
+Selected with LLM_GATEWAY_BACKEND=stub (or llm_gateway.use_backend("stub")).
+The answers are placeholders shaped like the real ones, so the apps run end to
+end without API keys or costs: chat completions (also streamed), embeddings,
+transcriptions, images, speech and voices, and Gemini text, chats and JSON
+that matches the requested schema. Every answer takes LLM_GATEWAY_STUB_LATENCY
+seconds (0.05 by default), like a fast real request.
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import struct
+import time
+import zlib
+
+LATENCY_SECONDS = float(os.getenv("LLM_GATEWAY_STUB_LATENCY", 0.05))
+
+# Numbers the stub answers, so repeated questions get different answers
+_answer_numbers = itertools.count(1)
+
+
+def stub_answer(question):
+    question = " ".join(str(question).split())
+    return (
+        f"This is stub answer {next(_answer_numbers)}. You asked: {question[:200]} "
+        "Set LLM_GATEWAY_BACKEND=live to get real answers."
+    )
+
+
+def make_png(width=64, height=64, color=(255, 200, 120)):
+    """A small single-colour PNG image."""
+    raw = b"".join(b"\x00" + bytes(color) * width for _ in range(height))
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+STUB_IMAGE = make_png()
+STUB_AUDIO = b"ID3\x03\x00\x00\x00\x00\x00\x00" + b"\x00" * 1024
+STUB_VOICES = [{"voice_id": "stub-voice", "name": "Stub voice", "category": "premade"}]
+
+
+# --- HTTP providers (OpenAI, ElevenLabs, Hugging Face, downloads) ---
+
+def _embedding(text, dimensions=16):
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [byte / 255 - 0.5 for byte in digest[:dimensions]]
+
+
+def _last_user_message(messages):
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content")
+            if isinstance(content, list):
+                return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+            return content or ""
+    return ""
+
+
+def _chat_completion(body):
+    import httpx
+
+    answer = stub_answer(_last_user_message(body.get("messages", [])))
+    model = body.get("model", "stub")
+    if not body.get("stream"):
+        return httpx.Response(200, json={
+            "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": len(answer) // 4, "total_tokens": 10 + len(answer) // 4},
+        })
+
+    # Server-sent events, one word per chunk
+    def event(delta, finish_reason=None):
+        chunk = {
+            "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    events = [event({"role": "assistant", "content": ""})]
+    events += [event({"content": word + " "}) for word in answer.split()]
+    events += [event({}, "stop"), "data: [DONE]\n\n"]
+    return httpx.Response(200, content="".join(events).encode("utf-8"), headers={"Content-Type": "text/event-stream"})
+
+
+def handle_http(request):
+    """The stub's answer to any HTTP request, as an httpx.Response."""
+    import httpx
+
+    path = request.url.path
+    body = request.content
+    if path.endswith("/chat/completions"):
+        return _chat_completion(json.loads(body))
+    if path.endswith("/embeddings"):
+        data = json.loads(body)
+        texts = data["input"] if isinstance(data["input"], list) else [data["input"]]
+        return httpx.Response(200, json={
+            "object": "list", "model": data.get("model", "stub"),
+            "data": [{"object": "embedding", "index": i, "embedding": _embedding(str(text))} for i, text in enumerate(texts)],
+            "usage": {"prompt_tokens": 1, "total_tokens": 1},
+        })
+    if path.endswith("/audio/transcriptions"):
+        text = "This is a stub transcription of your recording."
+        if b'name="response_format"\r\n\r\ntext' in body:
+            return httpx.Response(200, text=text)
+        return httpx.Response(200, json={"text": text})
+    if path.endswith("/images/generations"):
+        return httpx.Response(200, json={"created": int(time.time()), "data": [{"url": "https://stub.invalid/image.png"}]})
+    if "/text-to-speech/" in path:
+        return httpx.Response(200, content=STUB_AUDIO, headers={"Content-Type": "audio/mpeg"})
+    if path.endswith("/voices"):
+        return httpx.Response(200, json={"voices": STUB_VOICES})
+    # Image models (Hugging Face) and image downloads
+    return httpx.Response(200, content=STUB_IMAGE, headers={"Content-Type": "image/png"})
+
+
+class StubTransport:
+    """
+    Answers with handle_http() after the stub latency. It is only used inside
+    the gateway's transports, so it doesn't need to subclass httpx's.
+    """
+
+    def handle_request(self, request):
+        time.sleep(LATENCY_SECONDS)
+        return handle_http(request)
+
+    async def handle_async_request(self, request):
+        await asyncio.sleep(LATENCY_SECONDS)
+        return handle_http(request)
+
+    def close(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+# --- Gemini ---
+
+def _fake_from_schema(schema, name="value", index=1):
+    """A value matching a Gemini response schema (protos.Schema)."""
+    kind = schema.type_.name
+    if kind == "OBJECT":
+        return {key: _fake_from_schema(value, key, index) for key, value in schema.properties.items()}
+    if kind == "ARRAY":
+        return [_fake_from_schema(schema.items, name, i) for i in range(1, 4)]
+    if kind in ("INTEGER", "NUMBER"):
+        return index
+    if kind == "BOOLEAN":
+        return True
+    return f"Stub {name.replace('_', ' ')} {index}"
+
+
+def _gemini_answer(model, args, kwargs):
+    from google.generativeai.types import content_types, generation_types
+
+    contents = content_types.to_contents(args[0] if args else kwargs.get("contents"))
+    question = " ".join(part.text for part in contents[-1].parts) if contents else ""
+    prompt_tokens = sum(len(part.text) for content in contents for part in content.parts) // 4 + 1
+
+    config = dict(model._generation_config)
+    config.update(generation_types.to_generation_config_dict(kwargs.get("generation_config") or {}))
+    if config.get("response_schema") is not None:
+        answer = json.dumps(_fake_from_schema(config["response_schema"]))
+    elif config.get("response_mime_type") == "application/json":
+        answer = json.dumps([stub_answer(question) for _ in range(10)])
+    else:
+        answer = stub_answer(question)
+    return answer, prompt_tokens
+
+
+def _gemini_chunks(answer, prompt_tokens, pieces):
+    from google.generativeai import protos
+
+    size = max(1, -(-len(answer) // pieces))
+    texts = [answer[i:i + size] for i in range(0, len(answer), size)]
+    answer_tokens = len(answer) // 4 + 1
+    usage = protos.GenerateContentResponse.UsageMetadata(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=answer_tokens,
+        total_token_count=prompt_tokens + answer_tokens
+    )
+    return [
+        protos.GenerateContentResponse(
+            candidates=[protos.Candidate(
+                index=0,
+                content=protos.Content(role="model", parts=[protos.Part(text=text)]),
+                finish_reason=protos.Candidate.FinishReason.STOP if i == len(texts) - 1 else 0
+            )],
+            # Like Gemini, the usage comes with the last chunk
+            usage_metadata=usage if i == len(texts) - 1 else None
+        )
+        for i, text in enumerate(texts)
+    ]
+
+
+def gemini_response(model, *args, **kwargs):
+    from google.generativeai.types import generation_types
+
+    answer, prompt_tokens = _gemini_answer(model, args, kwargs)
+    if not kwargs.get("stream"):
+        time.sleep(LATENCY_SECONDS)
+        return generation_types.GenerateContentResponse.from_response(_gemini_chunks(answer, prompt_tokens, 1)[0])
+
+    def chunks():
+        for chunk in _gemini_chunks(answer, prompt_tokens, 4):
+            time.sleep(LATENCY_SECONDS / 4)
+            yield chunk
+    return generation_types.GenerateContentResponse.from_iterator(chunks())
+
+
+async def gemini_response_async(model, *args, **kwargs):
+    from google.generativeai.types import generation_types
+
+    answer, prompt_tokens = _gemini_answer(model, args, kwargs)
+    if not kwargs.get("stream"):
+        await asyncio.sleep(LATENCY_SECONDS)
+        return generation_types.AsyncGenerateContentResponse.from_response(_gemini_chunks(answer, prompt_tokens, 1)[0])
+
+    async def chunks():
+        for chunk in _gemini_chunks(answer, prompt_tokens, 4):
+            await asyncio.sleep(LATENCY_SECONDS / 4)
+            yield chunk
+    return await generation_types.AsyncGenerateContentResponse.from_aiterator(chunks())
+
+
+def gemini_count_tokens(*args, **kwargs):
+    from google.generativeai import protos
+    from google.generativeai.types import content_types
+
+    contents = content_types.to_contents(args[0] if args else kwargs.get("contents"))
+    return protos.CountTokensResponse(
+        total_tokens=sum(len(part.text) for content in contents for part in content.parts) // 4 + 1
+    )
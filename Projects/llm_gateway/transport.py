@@ -0,0 +1,89 @@
+"""
+httpx transports that add rate limiting and retries to every request.
+
+They wrap the transport that really sends the request (a pooled
+httpx.HTTPTransport, or the stub), so the OpenAI and ElevenLabs SDKs and
+plain httpx clients all get the same behaviour without any changes to the
+calls themselves.
+"""
+import asyncio
+import time
+
+import httpx
+
+from .limits import rate_limiter
+from .retry import MAX_RETRIES, RETRY_STATUS, backoff_delay, server_delay
+
+
+def _describe(provider, attempt, cause, delay):
+    print(f"{provider} request attempt {attempt + 1} failed ({cause}), retrying in {delay:.1f}s")
+
+
+class GatewayTransport(httpx.BaseTransport):
+    def __init__(self, provider, transport):
+        self.provider = provider
+        self.transport = transport
+
+    def handle_request(self, request):
+        # Keep the body in memory, so it can be sent again
+        request.read()
+        for attempt in range(MAX_RETRIES + 1):
+            bucket = rate_limiter(self.provider)
+            if bucket:
+                bucket.acquire()
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError as e:
+                # Connection problems and timeouts
+                if attempt == MAX_RETRIES:
+                    raise
+                delay = backoff_delay(attempt)
+                _describe(self.provider, attempt, e, delay)
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in RETRY_STATUS or attempt == MAX_RETRIES:
+                return response
+            body = response.read()
+            response.close()
+            delay = server_delay(response.headers, body)
+            delay = backoff_delay(attempt) if delay is None else delay
+            _describe(self.provider, attempt, response.status_code, delay)
+            time.sleep(delay)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncGatewayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, provider, transport):
+        self.provider = provider
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        await request.aread()
+        for attempt in range(MAX_RETRIES + 1):
+            bucket = rate_limiter(self.provider)
+            if bucket:
+                await bucket.acquire_async()
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                delay = backoff_delay(attempt)
+                _describe(self.provider, attempt, e, delay)
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code not in RETRY_STATUS or attempt == MAX_RETRIES:
+                return response
+            body = await response.aread()
+            await response.aclose()
+            delay = server_delay(response.headers, body)
+            delay = backoff_delay(attempt) if delay is None else delay
+            _describe(self.provider, attempt, response.status_code, delay)
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.transport.aclose()
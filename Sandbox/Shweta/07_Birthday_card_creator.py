@@ -1,17 +1,22 @@
 import streamlit as st
 import os
+import sys
 from dotenv import load_dotenv
-from openai import OpenAI
 from PIL import Image
-import requests
 from io import BytesIO
 
 # Load API key from .env file
 load_dotenv()
-API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Set up OpenAI client
-client = OpenAI(api_key=API_KEY)
+# Make the shared Projects/llm_gateway package importable. Streamlit reruns
+# this script on every interaction, so the path is only added once.
+PROJECTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "Projects")
+if PROJECTS_DIR not in sys.path:
+    sys.path.append(PROJECTS_DIR)
+import llm_gateway
+
+# Set up OpenAI client (pooled, rate limited and retried by the gateway)
+client = llm_gateway.openai_client()
 
 # Streamlit UI
 st.title("🎂 AI Birthday Card Creator")
@@ -43,7 +48,7 @@ if st.button("Generate Birthday Card"):
                 st.image(image_url, caption="Your AI-generated birthday card 🎉", use_column_width=True)
 
                 # Download option
-                img_data = requests.get(image_url).content
+                img_data = llm_gateway.http_client().get(image_url).content
                 st.download_button("Download Image", img_data, "birthday_card.png", "image/png")
 
             except Exception as e: